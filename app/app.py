@@ -1,18 +1,52 @@
+import os
+import shutil
+import sys
 from pathlib import Path
 
+from server.config import Settings
 from server.server import app
 
 __all__ = ["app"]
 
+
+def production_env() -> int:
+    """Prepare the environment inherited by the production workers."""
+    workers = int(os.getenv("WORKERS") or os.cpu_count() or 1)
+    os.environ["WORKERS"] = str(workers)
+    os.environ["PRODUCTION"] = "true"
+
+    metrics_dir = Path(
+        os.environ.setdefault(
+            "PROMETHEUS_MULTIPROC_DIR",
+            str(Settings.shared_state_dir / "prometheus"),
+        )
+    )
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    metrics_dir.mkdir(parents=True)
+    return workers
+
+
 if __name__ == "__main__":
     import uvicorn
 
     module = Path(__file__).stem
-    uvicorn.run(
-        f"{module}:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        # access_log=False,
-        workers=1,
-    )
+    if Settings.production or "--production" in sys.argv:
+        uvicorn.run(
+            f"{module}:app",
+            host="0.0.0.0",
+            port=8000,
+            workers=production_env(),
+            loop="uvloop",
+            http="httptools",
+            access_log=False,
+            proxy_headers=True,
+        )
+    else:
+        uvicorn.run(
+            f"{module}:app",
+            host="0.0.0.0",
+            port=8000,
+            reload=True,
+            # access_log=False,
+            workers=1,
+        )
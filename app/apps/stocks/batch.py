@@ -0,0 +1,52 @@
+import asyncio
+import logging
+
+from .manager import BaseStockImageManager
+from .schemas import BatchSearchResponse, BatchSearchResult, SearchQuery
+
+
+async def batch_search(
+    manager: BaseStockImageManager, queries: list[SearchQuery], concurrency: int = 8
+) -> BatchSearchResponse:
+    """Run many searches on one provider, keyed by `SearchQuery.key`.
+
+    Queries that resolve to the same search-cache key run once, at most
+    `concurrency` searches are in flight, and a failing query is reported
+    on its own instead of failing the batch.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(query: SearchQuery):
+        params = {"q": query.q, "page": query.page, "limit": query.limit}
+        if query.sort is not None:
+            params["sort"] = query.sort
+        async with semaphore:
+            return await manager.search(**params)
+
+    tasks: dict[str, asyncio.Task] = {}
+    keyed: dict[str, tuple[SearchQuery, asyncio.Task]] = {}
+    for query in queries:
+        page, limit = manager.clamp_page(query.page, query.limit)
+        search_key = manager.search_key(query.q, page, limit, sort=query.sort)
+        if search_key not in tasks:
+            tasks[search_key] = asyncio.ensure_future(run(query))
+        keyed.setdefault(query.key, (query, tasks[search_key]))
+
+    try:
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+    finally:
+        for task in tasks.values():
+            task.cancel()
+
+    results: dict[str, BatchSearchResult] = {}
+    for key, (query, task) in keyed.items():
+        if task.exception() is not None:
+            logging.warning(f"batch search {query.key}: {task.exception()}")
+            results[key] = BatchSearchResult(
+                query=query, status="error", error=str(task.exception())
+            )
+            continue
+        results[key] = BatchSearchResult(
+            query=query, status="ok", results=task.result()
+        )
+    return BatchSearchResponse(results=results)
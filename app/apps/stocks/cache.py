@@ -0,0 +1,366 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable
+
+import aiohttp
+from core import responses
+from server import db
+from server.config import Settings
+from singleton import Singleton
+from utils.cache import MISSING, SingleFlight, TTLCache
+
+from .decodl import is_failed, job_id_of
+from .schemas import StockImage
+
+
+def normalize_query(q: str) -> str:
+    return " ".join(q.lower().split())
+
+
+class SearchCache(metaclass=Singleton):
+    """Two-tier cache for search pages.
+
+    The first tier is an in-process LRU/TTL cache, the optional second tier
+    is a Mongo collection shared by every process. Concurrent misses for the
+    same key are coalesced into a single upstream call.
+    """
+
+    collection_name = "search_cache"
+
+    def __init__(self):
+        self.memory = TTLCache(
+            maxsize=Settings.search_cache_size,
+            ttl=Settings.search_cache_ttl,
+            name="search",
+        )
+        self.encoded = TTLCache(
+            maxsize=Settings.search_cache_size,
+            ttl=Settings.search_cache_ttl,
+            name="search_encoded",
+        )
+        self.flight = SingleFlight()
+        self.mongo_enabled = Settings.search_cache_mongo
+        self.mongo_hits = 0
+        self.mongo_misses = 0
+        self.mongo_errors = 0
+
+    @staticmethod
+    def make_key(
+        provider: str,
+        q: str,
+        page: int,
+        limit: int,
+        sort: str | None = None,
+        detail: str = "full",
+    ) -> str:
+        q = normalize_query(q)
+        key = f"{provider}:{q}:{page}:{limit}:{sort or ''}"
+        if detail != "full":
+            key = f"{key}:{detail}"
+        return key
+
+    @property
+    def collection(self):
+        return db.get_db()[self.collection_name]
+
+    async def init_collection(self):
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def get_or_fetch(
+        self, key: str, fetch: Callable[[], Awaitable[list[StockImage]]]
+    ) -> list[StockImage]:
+        stock_images = self.memory.get(key)
+        if stock_images is not None:
+            return stock_images
+        return await self.flight.do(key, self._load, key, fetch)
+
+    async def get(self, key: str) -> list[StockImage] | None:
+        """Cached page from any tier, waiting on an in-flight load of it."""
+        stock_images = self.memory.get(key)
+        if stock_images is not None:
+            return stock_images
+        if key in self.flight:
+            return await self.flight.do(key, self._mongo_load, key)
+        return await self._mongo_load(key)
+
+    async def _mongo_load(self, key: str) -> list[StockImage] | None:
+        stock_images = await self._mongo_get(key)
+        if stock_images is not None:
+            self.memory.set(key, stock_images)
+        return stock_images
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.memory or key in self.flight
+
+    async def get_or_fetch_encoded(
+        self, key: str, fetch: Callable[[], Awaitable[list[StockImage]]]
+    ) -> tuple[bytes, int]:
+        """Same as `get_or_fetch` but return the page as encoded JSON.
+
+        The number of images on the page is returned alongside it.
+        """
+        entry = self.encoded.get(key)
+        if entry is None:
+            stock_images = await self.get_or_fetch(key, fetch)
+            entry = responses.dumps(stock_images), len(stock_images)
+            self.encoded.set(key, entry)
+        return entry
+
+    async def _load(
+        self, key: str, fetch: Callable[[], Awaitable[list[StockImage]]]
+    ) -> list[StockImage]:
+        stock_images = await self._mongo_get(key)
+        if stock_images is None:
+            stock_images = await fetch()
+            await self._mongo_set(key, stock_images)
+        self.memory.set(key, stock_images)
+        return stock_images
+
+    async def set(self, key: str, stock_images: list[StockImage]):
+        self.encoded.pop(key)
+        self.memory.set(key, stock_images)
+        await self._mongo_set(key, stock_images)
+
+    async def _mongo_get(self, key: str) -> list[StockImage] | None:
+        if not self.mongo_enabled:
+            return None
+        try:
+            doc = await self.collection.find_one(
+                {"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}}
+            )
+        except Exception as e:
+            self.mongo_errors += 1
+            logging.warning(f"search cache read: {e}")
+            return None
+
+        if doc is None:
+            self.mongo_misses += 1
+            return None
+        self.mongo_hits += 1
+        return [StockImage(**row) for row in doc["results"]]
+
+    async def _mongo_set(self, key: str, stock_images: list[StockImage]):
+        if not self.mongo_enabled:
+            return
+        expires_at = datetime.now(timezone.utc) + timedelta(
+            seconds=Settings.search_cache_ttl
+        )
+        try:
+            await self.collection.replace_one(
+                {"_id": key},
+                {
+                    "results": [image.model_dump() for image in stock_images],
+                    "expires_at": expires_at,
+                },
+                upsert=True,
+            )
+        except Exception as e:
+            self.mongo_errors += 1
+            logging.warning(f"search cache write: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "memory": self.memory.stats(),
+            "encoded": self.encoded.stats(),
+            "mongo": {
+                "enabled": self.mongo_enabled,
+                "hits": self.mongo_hits,
+                "misses": self.mongo_misses,
+                "errors": self.mongo_errors,
+            },
+            "coalesced": self.flight.coalesced,
+            "in_flight": len(self.flight),
+        }
+
+
+class ResourceCache(metaclass=Singleton):
+    """Bounded cache of hydrated `StockImage` rows keyed by provider and id.
+
+    Upstream 404s are cached as `None` for a shorter TTL so missing
+    resources are not requested again on every page.
+    """
+
+    def __init__(self):
+        self.memory = TTLCache(
+            maxsize=Settings.resource_cache_size,
+            ttl=Settings.resource_cache_ttl,
+            name="resource",
+        )
+        self.negative_ttl = Settings.resource_cache_negative_ttl
+        self.flight = SingleFlight()
+        self.not_found = 0
+
+    async def get_or_fetch(
+        self, provider: str, id, fetch: Callable[[], Awaitable[StockImage]]
+    ) -> StockImage | None:
+        key = (provider, id)
+        stock_image = self.memory.get(key, MISSING)
+        if stock_image is not MISSING:
+            return stock_image
+        return await self.flight.do(key, self._load, key, fetch)
+
+    async def _load(
+        self, key: tuple, fetch: Callable[[], Awaitable[StockImage]]
+    ) -> StockImage | None:
+        try:
+            stock_image = await fetch()
+        except aiohttp.ClientResponseError as e:
+            if e.status != 404:
+                raise
+            self.not_found += 1
+            self.memory.set(key, None, ttl=self.negative_ttl)
+            return None
+
+        self.memory.set(key, stock_image)
+        return stock_image
+
+    def stats(self) -> dict:
+        return {
+            "memory": self.memory.stats(),
+            "not_found": self.not_found,
+            "coalesced": self.flight.coalesced,
+            "in_flight": len(self.flight),
+        }
+
+
+class DownloadCache(metaclass=Singleton):
+    """Memoize paid Decodl downloads by provider and product code.
+
+    Concurrent requests for the same asset share one submission, and the
+    resulting job is kept in memory and in Mongo so later requests reuse it
+    instead of paying for a new one. Failed jobs are forgotten so the next
+    request submits again. Entries expire `download_cache_ttl` seconds after
+    their last update, the lifetime of a Decodl file link.
+    """
+
+    collection_name = "downloads"
+
+    def __init__(self):
+        self.memory = TTLCache(
+            maxsize=Settings.download_cache_size,
+            ttl=Settings.download_cache_ttl,
+            name="download",
+        )
+        self.job_keys = TTLCache(
+            maxsize=Settings.download_cache_size, ttl=Settings.download_cache_ttl
+        )
+        self.flight = SingleFlight()
+        self.mongo_enabled = Settings.download_cache_mongo
+        self.submitted = 0
+        self.reused = 0
+        self.mongo_errors = 0
+
+    @staticmethod
+    def make_key(provider: str, code) -> str:
+        return f"{provider}:{code}"
+
+    @property
+    def collection(self):
+        return db.get_db()[self.collection_name]
+
+    @staticmethod
+    def expires_at() -> datetime:
+        return datetime.now(timezone.utc) + timedelta(
+            seconds=Settings.download_cache_ttl
+        )
+
+    async def init_collection(self):
+        await self.collection.create_index("job_id")
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def get_or_submit(
+        self, provider: str, code, submit: Callable[[], Awaitable[dict]]
+    ) -> dict:
+        key = self.make_key(provider, code)
+        job = self.memory.get(key)
+        if job is None:
+            job = await self._mongo_get(key)
+            if job is not None:
+                self._remember(key, job)
+
+        if job is not None and not is_failed(job):
+            self.reused += 1
+            return job
+        return await self.flight.do(key, self._submit, key, submit)
+
+    async def _submit(self, key: str, submit: Callable[[], Awaitable[dict]]) -> dict:
+        job = await submit()
+        self.submitted += 1
+        self._remember(key, job)
+        await self._mongo_set(key, job)
+        return job
+
+    def _remember(self, key: str, job: dict):
+        self.memory.set(key, job)
+        job_id = job_id_of(job)
+        if job_id is not None:
+            self.job_keys.set(job_id, key)
+
+    async def update_job(self, job_id: str, state: dict):
+        """Record the final state of a submitted job."""
+        key = self.job_keys.get(job_id)
+        if key is not None:
+            if is_failed(state):
+                self.memory.pop(key)
+            else:
+                self.memory.set(key, state)
+
+        if not self.mongo_enabled:
+            return
+        try:
+            if is_failed(state):
+                await self.collection.delete_one({"job_id": job_id})
+            else:
+                await self.collection.update_one(
+                    {"job_id": job_id},
+                    {
+                        "$set": {
+                            "job": state,
+                            "updated_at": datetime.now(timezone.utc),
+                            "expires_at": self.expires_at(),
+                        }
+                    },
+                )
+        except Exception as e:
+            self.mongo_errors += 1
+            logging.warning(f"download cache update: {e}")
+
+    async def _mongo_get(self, key: str) -> dict | None:
+        if not self.mongo_enabled:
+            return None
+        try:
+            doc = await self.collection.find_one(
+                {"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}}
+            )
+        except Exception as e:
+            self.mongo_errors += 1
+            logging.warning(f"download cache read: {e}")
+            return None
+        return doc["job"] if doc else None
+
+    async def _mongo_set(self, key: str, job: dict):
+        if not self.mongo_enabled:
+            return
+        try:
+            await self.collection.replace_one(
+                {"_id": key},
+                {
+                    "job_id": job_id_of(job),
+                    "job": job,
+                    "updated_at": datetime.now(timezone.utc),
+                    "expires_at": self.expires_at(),
+                },
+                upsert=True,
+            )
+        except Exception as e:
+            self.mongo_errors += 1
+            logging.warning(f"download cache write: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "memory": self.memory.stats(),
+            "mongo": {"enabled": self.mongo_enabled, "errors": self.mongo_errors},
+            "submitted": self.submitted,
+            "reused": self.reused,
+            "coalesced": self.flight.coalesced,
+        }
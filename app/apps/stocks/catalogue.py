@@ -0,0 +1,152 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from pymongo import TEXT, UpdateOne
+from server import db
+from server.config import Settings
+from singleton import Singleton
+
+from .cache import normalize_query
+from .schemas import StockImage
+
+
+class Catalogue(metaclass=Singleton):
+    """Local Mongo catalogue of every stock image the managers return.
+
+    Each image is stored once per provider and id with its URLs and
+    dimensions and the search terms that returned it, under a text index.
+    Rows from `detail=lite` searches never overwrite full rows. Entries not
+    seen for `catalogue_ttl` seconds expire. At most `catalogue_max_pending`
+    writes run at once; results arriving beyond that are not stored.
+    """
+
+    collection_name = "catalogue"
+
+    def __init__(self):
+        self.enabled = Settings.catalogue
+        self.tasks: set[asyncio.Task] = set()
+        self.stored = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.dropped = 0
+
+    @property
+    def collection(self):
+        return db.get_db()[self.collection_name]
+
+    async def init_collection(self):
+        await self.collection.create_index([("provider", 1), ("terms", TEXT)])
+        await self.collection.create_index(
+            "updated_at", expireAfterSeconds=Settings.catalogue_ttl
+        )
+
+    def add(
+        self,
+        provider: str,
+        q: str | None,
+        stock_images: list[StockImage],
+        lite: bool = False,
+    ):
+        """Store images in the background; never delays the response."""
+        if not self.enabled or not stock_images:
+            return
+        if len(self.tasks) >= Settings.catalogue_max_pending:
+            self.dropped += 1
+            return
+        task = asyncio.create_task(self._add(provider, q, stock_images, lite))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _add(
+        self, provider: str, q: str | None, stock_images: list[StockImage], lite: bool
+    ):
+        now = datetime.now(timezone.utc)
+        operations = []
+        for image in stock_images:
+            images = {
+                "original": image.original.model_dump(),
+                "preview": image.preview.model_dump(),
+            }
+            update = {"$set": {"provider": provider, "id": image.id, "updated_at": now}}
+            if lite:
+                update["$setOnInsert"] = {**images, "lite": True}
+            else:
+                update["$set"].update(images, lite=False)
+            if q:
+                update["$addToSet"] = {"terms": normalize_query(q)}
+            operations.append(
+                UpdateOne({"_id": f"{provider}:{image.id}"}, update, upsert=True)
+            )
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+            self.stored += len(operations)
+        except Exception as e:
+            self.errors += 1
+            logging.warning(f"catalogue write: {e}")
+
+    def query(self, provider: str, q: str, lite: bool = False) -> dict:
+        query = {
+            "provider": provider,
+            "$text": {"$search": f'"{normalize_query(q)}"'},
+            "updated_at": {
+                "$gte": datetime.now(timezone.utc)
+                - timedelta(seconds=Settings.catalogue_ttl)
+            },
+        }
+        if not lite:
+            query["lite"] = False
+        return query
+
+    async def search(
+        self, provider: str, q: str, page: int, limit: int, lite: bool = False
+    ) -> list[StockImage]:
+        """Text matches for `q` seen within `catalogue_ttl`.
+
+        Ordered by relevance, then id, so pages of one query do not overlap.
+        """
+        try:
+            cursor = (
+                self.collection.find(
+                    self.query(provider, q, lite), {"score": {"$meta": "textScore"}}
+                )
+                .sort([("score", {"$meta": "textScore"}), ("id", 1)])
+                .skip((page - 1) * limit)
+                .limit(limit)
+            )
+            docs = await cursor.to_list(length=limit)
+        except Exception as e:
+            self.errors += 1
+            logging.warning(f"catalogue search: {e}")
+            return []
+        return [
+            StockImage(id=doc["id"], original=doc["original"], preview=doc["preview"])
+            for doc in docs
+        ]
+
+    async def covers(self, provider: str, q: str, limit: int, lite: bool = False):
+        """Whether the catalogue holds at least a full first page for `q`."""
+        try:
+            count = await self.collection.count_documents(
+                self.query(provider, q, lite), limit=limit
+            )
+        except Exception as e:
+            self.errors += 1
+            logging.warning(f"catalogue count: {e}")
+            return False
+        return count >= limit
+
+    async def stop(self):
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "stored": self.stored,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "writing": len(self.tasks),
+        }
@@ -0,0 +1,298 @@
+import asyncio
+import logging
+import os
+import time
+
+import jwt
+from server.config import Settings
+from singleton import Singleton
+from utils.aionetwork import SessionPool, aio_request_session
+from utils.cache import SingleFlight
+from utils.sharedstate import MongoSharedStore, SharedFileStore
+
+TERMINAL_STATUSES = {
+    "completed",
+    "complete",
+    "done",
+    "success",
+    "succeeded",
+    "failed",
+    "error",
+    "canceled",
+    "cancelled",
+}
+FAILED_STATUSES = {"failed", "error", "canceled", "cancelled"}
+PENDING_STATUSES = {
+    "",
+    "pending",
+    "queued",
+    "waiting",
+    "created",
+    "started",
+    "running",
+    "processing",
+    "in_progress",
+    "downloading",
+}
+
+
+def job_id_of(job: dict) -> str | None:
+    for key in ("_id", "id", "jobId", "job_id"):
+        if job.get(key):
+            return str(job[key])
+    return None
+
+
+def job_status(job: dict | None) -> str:
+    if not job:
+        return ""
+    return str(job.get("status", "")).lower()
+
+
+def is_terminal(job: dict | None) -> bool:
+    return job_status(job) in TERMINAL_STATUSES
+
+
+def is_failed(job: dict | None) -> bool:
+    return job_status(job) in FAILED_STATUSES
+
+
+def is_unknown(job: dict | None) -> bool:
+    """Whether a job reports a status that is neither pending nor terminal."""
+    status = job_status(job)
+    return status not in PENDING_STATUSES and status not in TERMINAL_STATUSES
+
+
+def give_up_unknown(job: dict) -> dict:
+    """Failed copy of a job that stayed in an unknown status for too long."""
+    status = job_status(job)
+    return {
+        **job,
+        "status": "error",
+        "unknown_status": status,
+        "error": f"Unknown Decodl job status {status!r}",
+    }
+
+
+def job_file_url(job: dict | None) -> str | None:
+    if not job or job_status(job) in FAILED_STATUSES:
+        return None
+    for source in (job.get("result"), job):
+        if not isinstance(source, dict):
+            continue
+        for key in ("url", "downloadUrl", "download_url", "link", "file"):
+            if isinstance(source.get(key), str):
+                return source[key]
+    return None
+
+
+def token_expiry(token: str | None) -> float | None:
+    if not token:
+        return None
+    try:
+        decoded = jwt.decode(token, options={"verify_signature": False})
+    except jwt.exceptions.DecodeError:
+        return None
+    return decoded.get("exp")
+
+
+class DecodlCredentials(metaclass=Singleton):
+    """Decodl app token with a cached expiry and proactive background refresh.
+
+    Request paths only read `token`; the expiry is decoded once per token and
+    a background task renews it `decodl_refresh_margin` seconds before it
+    runs out. Concurrent refreshes collapse into a single upstream call.
+
+    With several workers the tokens live in a `SharedFileStore`: refreshes
+    take its lock, so only one worker talks to Decodl, and the others pick
+    the new tokens up on their next `token` read. With the download queue,
+    whose workers may run on other nodes, they live in a `MongoSharedStore`
+    instead and are reloaded every `shared_state_poll` seconds.
+    """
+
+    def __init__(self):
+        self.token_url = f"{Settings.DECODL_BASE_URL}/api/auth/application/decodl/token"
+        self.refresh_url = f"{Settings.DECODL_BASE_URL}/api/auth/refresh"
+        self.app_secret = Settings.DECODL_APP_SECRET
+        self.app_secret_exp = self.expiry(self.app_secret)
+        self.access_token = Settings.DECODL_ACCESS_TOKEN
+        self.access_token_exp = self.expiry(self.access_token)
+        self.refresh_token = Settings.DECODL_REFRESH_TOKEN
+        self.flight = SingleFlight()
+        self.refreshes = 0
+        self._task: asyncio.Task | None = None
+
+        # the API workers and the download workers all use the same tokens
+        self.shared = Settings.workers > 1 or Settings.download_queue
+        self.remote = Settings.download_queue
+        if self.remote:
+            self.store = MongoSharedStore("decodl")
+        else:
+            self.store = SharedFileStore(Settings.shared_state_dir / "decodl.json")
+        self._store_mtime = 0.0
+
+    @property
+    def token(self) -> str:
+        if self.shared and not self.remote:
+            self.sync()
+        return self.app_secret
+
+    def sync(self):
+        """Reload the shared tokens when another worker has written them."""
+        try:
+            mtime = os.stat(self.store.path).st_mtime
+        except FileNotFoundError:
+            return
+        if mtime != self._store_mtime:
+            self._store_mtime = mtime
+            self.apply_shared(self.store.read())
+
+    async def load_shared(self):
+        self.apply_shared(await self.store.load())
+
+    def apply_shared(self, data: dict):
+        app_secret_exp = data.get("app_secret_exp") or token_expiry(
+            data.get("app_secret")
+        )
+        if app_secret_exp and app_secret_exp > (self.app_secret_exp or 0):
+            self.app_secret = data["app_secret"]
+            self.app_secret_exp = app_secret_exp
+        access_token_exp = data.get("access_token_exp") or token_expiry(
+            data.get("access_token")
+        )
+        if access_token_exp and access_token_exp > (self.access_token_exp or 0):
+            self.access_token = data["access_token"]
+            self.access_token_exp = access_token_exp
+            self.refresh_token = data.get("refresh_token", self.refresh_token)
+
+    async def save_shared(self):
+        await self.store.save(
+            {
+                "app_secret": self.app_secret,
+                "app_secret_exp": self.app_secret_exp,
+                "access_token": self.access_token,
+                "access_token_exp": self.access_token_exp,
+                "refresh_token": self.refresh_token,
+            }
+        )
+
+    def is_valid(self, margin: float = 0) -> bool:
+        if self.app_secret_exp is None:
+            return False
+        return self.app_secret_exp - margin > time.time()
+
+    @staticmethod
+    def expiry(token: str | None) -> float | None:
+        """The token's `exp`, or `decodl_token_lifetime` from now without one."""
+        if not token:
+            return None
+        return token_expiry(token) or time.time() + Settings.decodl_token_lifetime
+
+    def start(self):
+        if not self.app_secret:
+            logging.warning("decodl app secret not configured, not refreshing it")
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def refresh(self, force: bool = False) -> str:
+        return await self.flight.do("app_secret", self._refresh, force)
+
+    async def refresh_access_token(self) -> str:
+        return await self.flight.do("access_token", self._refresh_access_token)
+
+    async def _refresh(self, force: bool = False) -> str:
+        if not self.shared:
+            return await self._refresh_app_secret()
+
+        app_secret = self.app_secret
+        async with self.store.lock():
+            await self.load_shared()
+            # another worker refreshed meanwhile; a reset would revoke its token
+            renewed = self.app_secret != app_secret
+            if (not force or renewed) and self.is_valid(Settings.decodl_refresh_margin):
+                return self.app_secret
+            await self._refresh_app_secret()
+            await self.save_shared()
+            return self.app_secret
+
+    async def _refresh_app_secret(self) -> str:
+        access_token_valid = (
+            self.access_token_exp is not None
+            and self.access_token_exp - Settings.decodl_refresh_margin > time.time()
+        )
+        if not access_token_valid and self.refresh_token:
+            await self.refresh_access_token()
+
+        session = SessionPool().get_session(self.token_url)
+        res: dict = await aio_request_session(
+            session,
+            method="post",
+            url=self.token_url,
+            params={"reset": "true", "customErrorHandle": "false"},
+            cookies={
+                "xAccessToken": self.access_token,
+                "xRefreshToken": self.refresh_token,
+            },
+            headers={
+                "accept": "application/json",
+                "authorization": f"Bearer {self.access_token}",
+            },
+        )
+        self.app_secret = res["accessToken"]
+        self.app_secret_exp = self.expiry(self.app_secret)
+        self.refreshes += 1
+        logging.info("decodl app token refreshed")
+        return self.app_secret
+
+    async def _refresh_access_token(self) -> str:
+        session = SessionPool().get_session(self.refresh_url)
+        res: dict = await aio_request_session(
+            session,
+            method="post",
+            url=self.refresh_url,
+            cookies={"xRefreshToken": self.refresh_token},
+            headers={
+                "accept": "application/json",
+                "content-type": "application/json",
+            },
+            json={"refreshToken": self.refresh_token},
+        )
+        self.access_token = res["accessToken"]
+        self.access_token_exp = self.expiry(self.access_token)
+        self.refresh_token = res.get("refreshToken", self.refresh_token)
+        return self.access_token
+
+    def _seconds_to_refresh(self) -> float:
+        if self.app_secret_exp is None:
+            return 0
+        return self.app_secret_exp - Settings.decodl_refresh_margin - time.time()
+
+    async def _run(self):
+        while True:
+            if self.shared:
+                try:
+                    await self.load_shared()
+                except Exception as e:
+                    logging.warning(f"decodl shared tokens: {e}")
+            delay = self._seconds_to_refresh()
+            if delay <= 0:
+                try:
+                    await self.refresh()
+                    delay = self._seconds_to_refresh()
+                except Exception as e:
+                    logging.error(f"decodl token refresh: {e}")
+                    delay = Settings.decodl_refresh_retry
+            delay = max(Settings.decodl_refresh_retry, delay)
+            if self.remote:
+                delay = min(delay, Settings.shared_state_poll)
+            await asyncio.sleep(delay)
@@ -0,0 +1,69 @@
+import asyncio
+import itertools
+import logging
+
+from .manager import BaseStockImageManager
+from .schemas import FederatedSearchResponse, FederatedStockImage, ProviderSearchStatus
+
+
+async def federated_search(
+    q: str, page: int = 1, limit: int = 10, timeout: float = 3, **kwargs
+) -> FederatedSearchResponse:
+    """Search every registered provider at once and interleave the results.
+
+    Providers that do not answer within `timeout` seconds are reported as
+    timed out instead of failing the whole request; their searches keep
+    running in the background and land in the search cache.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    elapsed: dict[str, float] = {}
+
+    def finished(provider: str):
+        return lambda _: elapsed.setdefault(provider, loop.time() - started)
+
+    tasks: dict[str, asyncio.Task] = {}
+    for provider, manager in BaseStockImageManager.registry.items():
+        task = asyncio.ensure_future(
+            manager().search(q=q, page=page, limit=limit, **kwargs)
+        )
+        task.add_done_callback(finished(provider))
+        tasks[provider] = task
+
+    await asyncio.wait(tasks.values(), timeout=timeout)
+
+    rows: list[list[FederatedStockImage]] = []
+    statuses: dict[str, ProviderSearchStatus] = {}
+    for provider, task in tasks.items():
+        if not task.done():
+            task.cancel()
+            statuses[provider] = ProviderSearchStatus(
+                status="timeout", elapsed=loop.time() - started
+            )
+            continue
+
+        if task.exception() is not None:
+            logging.warning(f"federated search {provider}: {task.exception()}")
+            statuses[provider] = ProviderSearchStatus(
+                status="error",
+                elapsed=elapsed[provider],
+                error=str(task.exception()),
+            )
+            continue
+
+        provider_rows = [
+            FederatedStockImage(provider=provider, **image.model_dump())
+            for image in task.result()
+        ]
+        rows.append(provider_rows)
+        statuses[provider] = ProviderSearchStatus(
+            status="ok", count=len(provider_rows), elapsed=elapsed[provider]
+        )
+
+    results = [
+        image
+        for group in itertools.zip_longest(*rows)
+        for image in group
+        if image is not None
+    ]
+    return FederatedSearchResponse(results=results, providers=statuses)
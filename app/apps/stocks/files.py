@@ -0,0 +1,201 @@
+import asyncio
+import mimetypes
+from pathlib import Path
+from urllib.parse import urlparse
+
+import aiofiles
+import aiohttp
+import fastapi
+from core import exceptions
+from fastapi.responses import StreamingResponse
+from server.config import Settings
+from singleton import Singleton
+from utils.aionetwork import SessionPool
+from utils.diskcache import DiskCache
+
+PASSTHROUGH_HEADERS = (
+    "Content-Type",
+    "Content-Length",
+    "Content-Range",
+    "Accept-Ranges",
+    "ETag",
+    "Last-Modified",
+)
+
+
+def parse_range(value: str | None, size: int) -> tuple[int, int] | None:
+    """Parse a single `bytes=start-end` range into inclusive offsets."""
+    if not value:
+        return None
+
+    unit, _, spec = value.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        raise ValueError(f"Unsupported range {value}")
+
+    start, _, end = spec.strip().partition("-")
+    if start:
+        first = int(start)
+        last = int(end) if end else size - 1
+    else:
+        first = max(0, size - int(end))
+        last = size - 1
+
+    last = min(last, size - 1)
+    if first > last:
+        raise ValueError(f"Unsatisfiable range {value}")
+    return first, last
+
+
+class UpstreamFileResponse(StreamingResponse):
+    """Streaming response that always releases its upstream response.
+
+    The release also happens when the client disconnects before or during
+    the body, where a background task would not run.
+    """
+
+    def __init__(self, upstream: aiohttp.ClientResponse, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.upstream = upstream
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.upstream.release()
+
+
+class FileProxy(metaclass=Singleton):
+    """Stream downloaded originals to clients without buffering them.
+
+    Range requests are forwarded upstream or served from the local copy,
+    and complete upstream responses can be teed into a size-bounded disk
+    cache so the next request for the same asset is served locally.
+    """
+
+    def __init__(self):
+        self.chunk_size = Settings.download_chunk_size
+        self.cache = None
+        if Settings.file_cache_enabled:
+            self.cache = DiskCache(
+                Settings.file_cache_dir, Settings.file_cache_max_size
+            )
+
+    async def serve(self, request: fastapi.Request, key: str, url: str):
+        if self.cache is not None:
+            path = self.cache.get(key)
+            if path is not None:
+                return self._serve_local(request, path, url)
+        return await self._serve_upstream(request, key, url)
+
+    def _serve_local(self, request: fastapi.Request, path: Path, url: str):
+        size = path.stat().st_size
+        try:
+            byte_range = parse_range(request.headers.get("Range"), size)
+        except ValueError as e:
+            raise exceptions.BaseHTTPException(
+                status_code=416,
+                error="Range Not Satisfiable",
+                message=str(e),
+                headers={"Content-Range": f"bytes */{size}"},
+            )
+
+        first, last = byte_range or (0, size - 1)
+        headers = {
+            "Accept-Ranges": "bytes",
+            "Content-Length": str(last - first + 1),
+        }
+        if byte_range is not None:
+            headers["Content-Range"] = f"bytes {first}-{last}/{size}"
+
+        async def stream():
+            async with aiofiles.open(path, "rb") as f:
+                await f.seek(first)
+                remaining = last - first + 1
+                while remaining > 0:
+                    chunk = await f.read(min(self.chunk_size, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    yield chunk
+
+        media_type = mimetypes.guess_type(urlparse(url).path)[0]
+        return StreamingResponse(
+            stream(),
+            status_code=206 if byte_range is not None else 200,
+            headers=headers,
+            media_type=media_type or "application/octet-stream",
+        )
+
+    async def _serve_upstream(self, request: fastapi.Request, key: str, url: str):
+        # byte ranges and Content-Length must refer to the bytes we send
+        headers = {"Accept-Encoding": "identity"}
+        if request.headers.get("Range"):
+            headers["Range"] = request.headers["Range"]
+
+        session = SessionPool().get_session(url)
+        response = await session.get(url, headers=headers)
+        try:
+            return self._upstream_response(key, response)
+        except BaseException:
+            response.release()
+            raise
+
+    def _upstream_response(self, key: str, response: aiohttp.ClientResponse):
+        if response.status >= 400:
+            raise exceptions.BaseHTTPException(
+                status_code=response.status,
+                error="Upstream Error",
+                message=f"Could not fetch the file: {response.reason}",
+                headers={
+                    name: response.headers[name]
+                    for name in ("Content-Range",)
+                    if name in response.headers
+                },
+            )
+
+        tee = (
+            self.cache is not None
+            and response.status == 200
+            and response.content_length is not None
+            and response.content_length <= Settings.file_cache_max_file_size
+        )
+
+        async def stream():
+            temp_path = self.cache.temp_path(key) if tee else None
+            f = await aiofiles.open(temp_path, "wb") if tee else None
+            completed = False
+            try:
+                async for chunk in response.content.iter_chunked(self.chunk_size):
+                    if f is not None:
+                        await f.write(chunk)
+                    yield chunk
+                completed = True
+            finally:
+                response.release()
+                if f is not None:
+                    await f.close()
+                    if completed:
+                        await asyncio.to_thread(self.cache.commit, key, temp_path)
+                    else:
+                        self.cache.discard(temp_path)
+
+        passthrough = {
+            name: response.headers[name]
+            for name in PASSTHROUGH_HEADERS
+            if name in response.headers
+        }
+        if "Content-Encoding" in response.headers:
+            # aiohttp decodes the body, so the upstream length does not apply
+            passthrough.pop("Content-Length", None)
+        passthrough.setdefault("Accept-Ranges", "bytes")
+        return UpstreamFileResponse(
+            response,
+            stream(),
+            status_code=response.status,
+            headers=passthrough,
+        )
+
+    def stats(self) -> dict:
+        if self.cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.cache.stats()}
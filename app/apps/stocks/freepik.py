@@ -1,38 +1,66 @@
 import asyncio
-import random
 
 import aiohttp
 from server.config import Settings
-from utils.aionetwork import aio_request, aio_request_session
+from utils.aionetwork import SessionPool
 
+from .cache import ResourceCache
+from .catalogue import Catalogue
 from .manager import BaseStockImageManager
 from .schemas import StockBaseImage, StockImage
 
 
 class FreePikManager(BaseStockImageManager):
+    provider = "freepik"
+    page_size = 100
+
     def __init__(self, api_key: str = Settings.FREEPIK_API_KEY):
         super().__init__(api_key)
         self.api_key = api_key
-        self.base_url = "https://api.freepik.com/v1/resources"
+        self.base_url = Settings.FREEPIK_BASE_URL
         self.headers = {
             "Accept-Language": "en-US",
             "Accept": "application/json",
             "Content-Type": "application/json",
             "X-Freepik-API-Key": self.api_key,
         }
-        self.provider = "freepik"
 
     async def get_row(self, row: dict, session: aiohttp.ClientSession = None):
         id = row.get("id")
-        await asyncio.sleep(random.uniform(0.1, 0.3))
-        url = f"{self.base_url}/{id}"
+        return await ResourceCache().get_or_fetch(
+            self.provider, id, lambda: self.fetch_row(id, session)
+        )
+
+    async def get_lite_row(self, row: dict, session: aiohttp.ClientSession = None):
+        source: dict = row.get("image", {}).get("source", {})
+        if not source.get("url"):
+            return None
+
+        width, _, height = str(source.get("size", "")).partition("x")
+        image = StockBaseImage(
+            url=source["url"],
+            width=int(width) if width.isdigit() else 1,
+            height=int(height) if height.isdigit() else 1,
+        )
+        return StockImage(id=row.get("id"), original=image, preview=image)
+
+    async def hydrate(self, ids: list[int]) -> list[StockImage]:
+        session = SessionPool().get_session(self.base_url)
+        stock_images = await asyncio.gather(
+            *[self.get_row({"id": id}, session) for id in ids]
+        )
+        stock_images = [image for image in stock_images if image is not None]
+        Catalogue().add(self.provider, None, stock_images)
+        return stock_images
 
-        if session is None:
-            response = await aio_request(url=url, headers=self.headers)
-        else:
-            response = await aio_request_session(
-                session=session, url=url, headers=self.headers
-            )
+    async def fetch_row(self, id, session: aiohttp.ClientSession = None):
+        url = f"{self.base_url}/{id}"
+        response = await self.upstream_request(
+            url=url,
+            headers=self.headers,
+            session=session,
+            hedge_after=Settings.http_hedge_after,
+        )
 
         response_data: dict = response.get("data", {})
 
@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timezone
+
+from server import db
+from server.config import Settings
+from singleton import Singleton
+from utils.cache import TTLCache
+
+from .decodl import is_failed, is_terminal, job_file_url, job_id_of
+from .jobs import JobTracker
+from .manager import BaseStockImageManager
+from .schemas import DownloadGroupItem, DownloadGroupStatus
+from .taskqueue import COMPLETED, FAILED, QUEUED, DownloadQueue
+
+
+class DownloadGroups(metaclass=Singleton):
+    """Bulk download submissions tracked under one group id.
+
+    Codes are submitted in the background through the manager's `download`,
+    at most `bulk_download_concurrency` at a time, and every job is handed to
+    `JobTracker`, so a group status read costs no upstream calls for jobs
+    this process is already polling. With the download queue enabled the
+    codes are only enqueued and item status is read from the queue. Groups
+    are kept in memory and, with `download_cache_mongo`, in Mongo for the
+    other workers.
+    """
+
+    collection_name = "download_groups"
+
+    def __init__(self):
+        self.memory = TTLCache(
+            maxsize=Settings.download_cache_size,
+            ttl=Settings.download_cache_ttl,
+            name="download_groups",
+        )
+        self.mongo_enabled = Settings.download_cache_mongo
+        self.tasks: set[asyncio.Task] = set()
+        self.mongo_errors = 0
+
+    @property
+    def collection(self):
+        return db.get_db()[self.collection_name]
+
+    async def init_collection(self):
+        await self.collection.create_index(
+            "created_at", expireAfterSeconds=Settings.download_cache_ttl
+        )
+
+    async def create(self, provider: str, codes: list[int]) -> dict:
+        group = {
+            "_id": uuid.uuid4().hex,
+            "provider": provider,
+            "items": [
+                {"code": code, "job_id": None, "error": None}
+                for code in dict.fromkeys(codes)
+            ],
+            "created_at": datetime.now(timezone.utc),
+        }
+        self.memory.set(group["_id"], group)
+        await self._mongo_call("write", "insert_one", group)
+
+        task = asyncio.create_task(self._submit(group))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return group
+
+    async def get(self, group_id: str) -> dict | None:
+        group = self.memory.get(group_id)
+        if group is None and self.mongo_enabled:
+            group = await self._mongo_call("read", "find_one", {"_id": group_id})
+        return group
+
+    async def status(self, group_id: str) -> DownloadGroupStatus | None:
+        group = await self.get(group_id)
+        if group is None:
+            return None
+
+        items = await asyncio.gather(
+            *[self._item_status(group["provider"], item) for item in group["items"]]
+        )
+        completed = sum(item.status == "completed" for item in items)
+        failed = sum(item.status in ("failed", "error") for item in items)
+        pending = len(items) - completed - failed
+        return DownloadGroupStatus(
+            group_id=group["_id"],
+            provider=group["provider"],
+            total=len(items),
+            completed=completed,
+            failed=failed,
+            pending=pending,
+            done=pending == 0,
+            items=items,
+        )
+
+    async def _item_status(self, provider: str, item: dict) -> DownloadGroupItem:
+        if DownloadQueue().enabled:
+            return await self._queued_item_status(provider, item)
+        if item["error"] is not None:
+            return DownloadGroupItem(**item, status="error")
+        if item["job_id"] is None:
+            return DownloadGroupItem(**item, status="submitting")
+
+        try:
+            state = await JobTracker().get(provider, item["job_id"])
+        except Exception as e:
+            logging.warning(f"download group job {item['job_id']}: {e}")
+            return DownloadGroupItem(**item, status="pending")
+
+        if is_failed(state):
+            status = "failed"
+        elif is_terminal(state):
+            status = "completed"
+        else:
+            status = "pending"
+        return DownloadGroupItem(**item, status=status, url=job_file_url(state))
+
+    async def _queued_item_status(self, provider: str, item: dict) -> DownloadGroupItem:
+        doc = await DownloadQueue().get(provider, item["code"])
+        if doc is None or doc["status"] == QUEUED:
+            return DownloadGroupItem(**item, status="submitting")
+        status = {COMPLETED: "completed", FAILED: "failed"}.get(
+            doc["status"], "pending"
+        )
+        return DownloadGroupItem(
+            code=item["code"],
+            job_id=doc.get("job_id"),
+            status=status,
+            error=doc.get("error"),
+            url=job_file_url(doc.get("job")),
+        )
+
+    async def _submit(self, group: dict):
+        manager = BaseStockImageManager.registry[group["provider"]]()
+        semaphore = asyncio.Semaphore(Settings.bulk_download_concurrency)
+
+        async def submit(index: int, item: dict):
+            async with semaphore:
+                try:
+                    if DownloadQueue().enabled:
+                        await DownloadQueue().enqueue(group["provider"], item["code"])
+                        return
+                    job = await manager.download(item["code"])
+                    await JobTracker().track(group["provider"], job)
+                    item["job_id"] = job_id_of(job)
+                    if item["job_id"] is None:
+                        item["error"] = "Decodl returned no job id"
+                except Exception as e:
+                    logging.warning(f"download group {group['_id']}: {e}")
+                    item["error"] = str(e) or type(e).__name__
+            await self._mongo_call(
+                "write",
+                "update_one",
+                {"_id": group["_id"]},
+                {"$set": {f"items.{index}": item}},
+            )
+
+        await asyncio.gather(
+            *[submit(index, item) for index, item in enumerate(group["items"])]
+        )
+
+    async def _mongo_call(self, action: str, method: str, *args):
+        if not self.mongo_enabled:
+            return None
+        try:
+            return await getattr(self.collection, method)(*args)
+        except Exception as e:
+            self.mongo_errors += 1
+            logging.warning(f"download groups {action}: {e}")
+            return None
+
+    async def stop(self):
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "memory": self.memory.stats(),
+            "mongo": {"enabled": self.mongo_enabled, "errors": self.mongo_errors},
+            "submitting": len(self.tasks),
+        }
@@ -1,15 +1,13 @@
-import asyncio
 import os
-import random
 
 import aiohttp
 from apps.stocks.schema import StockBaseImage, StockImage
 from utils.aionetwork import aio_request, aio_request_session
+from utils.ratelimit import RateLimiterRegistry
 
 
 async def get_freepik(row: dict, session: aiohttp.ClientSession = None):
     id = row.get("id")
-    await asyncio.sleep(random.uniform(0.1, 0.3))
     url = f"https://api.freepik.com/v1/resources/{id}"
     headers = {
         "Accept-Language": "en-US",
@@ -17,10 +15,13 @@ async def get_freepik(row: dict, session: aiohttp.ClientSession = None):
         "Content-Type": "application/json",
         "X-Freepik-API-Key": os.getenv("FREEPIK_API_KEY"),
     }
-    if session is None:
-        response = await aio_request(url=url, headers=headers)
-    else:
-        response = await aio_request_session(session=session, url=url, headers=headers)
+    async with RateLimiterRegistry().get("freepik").limit():
+        if session is None:
+            response = await aio_request(url=url, headers=headers)
+        else:
+            response = await aio_request_session(
+                session=session, url=url, headers=headers
+            )
 
     freepik_object = StockImage(
         id=id,
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import time
+from typing import AsyncIterator
+
+from server.config import Settings
+from singleton import Singleton
+
+from .cache import DownloadCache
+from .decodl import give_up_unknown, is_terminal, is_unknown, job_id_of, job_status
+from .manager import BaseStockImageManager
+
+
+class TrackedJob:
+    def __init__(self, provider: str, job_id: str, state: dict | None = None):
+        self.provider = provider
+        self.job_id = job_id
+        self.state = state
+        self.interval = Settings.job_poll_interval
+        self.next_poll = time.monotonic()
+        self.updated_at = time.monotonic()
+        self.unknown_since: float | None = None
+
+
+class JobTracker(metaclass=Singleton):
+    """Poll pending Decodl jobs in one background loop and push their changes.
+
+    Each job is polled with its own backoff: the interval resets when the
+    status changes and grows while it does not. Status routes read the
+    latest state from memory and subscribers receive every change. A job
+    whose status is not a known Decodl one is logged and, after
+    `job_unknown_status_timeout` seconds in it, given up as failed.
+    """
+
+    def __init__(self):
+        self.jobs: dict[str, TrackedJob] = {}
+        self.subscribers: dict[str, set[asyncio.Queue]] = {}
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def track(self, provider: str, job: dict) -> TrackedJob | None:
+        """Start polling a submitted job.
+
+        A job that is already tracked keeps its state: `job` may be a memoized
+        submission payload older than what the poll loop has seen since.
+        """
+        job_id = job_id_of(job)
+        if job_id is None:
+            return None
+        tracked = self.jobs.get(job_id)
+        if tracked is None or tracked.state is None:
+            tracked = self.jobs.setdefault(job_id, TrackedJob(provider, job_id))
+            await self._update(tracked, job)
+        return tracked
+
+    async def get(self, provider: str, job_id: str) -> dict:
+        tracked = self.jobs.get(job_id)
+        if tracked is None or tracked.state is None:
+            state = await BaseStockImageManager.registry[provider]().get_job(job_id)
+            tracked = self.jobs.setdefault(job_id, TrackedJob(provider, job_id))
+            await self._update(tracked, state)
+        return tracked.state
+
+    async def subscribe(self, provider: str, job_id: str) -> AsyncIterator[dict]:
+        """Yield the current state of a job and then every change until it ends."""
+        queue: asyncio.Queue = asyncio.Queue()
+        self.subscribers.setdefault(job_id, set()).add(queue)
+        try:
+            state = await self.get(provider, job_id)
+            while True:
+                yield state
+                if is_terminal(state):
+                    return
+                state = await queue.get()
+        finally:
+            queues = self.subscribers.get(job_id, set())
+            queues.discard(queue)
+            if not queues:
+                self.subscribers.pop(job_id, None)
+
+    async def _update(self, tracked: TrackedJob, state: dict):
+        now = time.monotonic()
+        if not is_unknown(state):
+            tracked.unknown_since = None
+        elif tracked.unknown_since is None:
+            tracked.unknown_since = now
+            logging.warning(
+                f"job tracker {tracked.job_id}: unknown status {job_status(state)!r}"
+            )
+        elif now - tracked.unknown_since > Settings.job_unknown_status_timeout:
+            state = give_up_unknown(state)
+        if state == tracked.state:
+            tracked.interval = min(
+                Settings.job_poll_max_interval,
+                tracked.interval * Settings.job_poll_backoff,
+            )
+        else:
+            tracked.state = state
+            tracked.updated_at = now
+            tracked.interval = Settings.job_poll_interval
+            for queue in self.subscribers.get(tracked.job_id, ()):
+                queue.put_nowait(state)
+            if is_terminal(state):
+                await DownloadCache().update_job(tracked.job_id, state)
+        tracked.next_poll = now + tracked.interval
+
+    async def _poll(self, tracked: TrackedJob):
+        manager = BaseStockImageManager.registry[tracked.provider]()
+        try:
+            state = await manager.get_job(tracked.job_id)
+        except Exception as e:
+            logging.warning(f"job tracker {tracked.job_id}: {e}")
+            tracked.interval = min(
+                Settings.job_poll_max_interval,
+                tracked.interval * Settings.job_poll_backoff,
+            )
+            tracked.next_poll = time.monotonic() + tracked.interval
+            return
+        await self._update(tracked, state)
+
+    def _evict(self, now: float):
+        for job_id, tracked in list(self.jobs.items()):
+            expired = now - tracked.updated_at > Settings.job_retention
+            if expired and job_id not in self.subscribers:
+                del self.jobs[job_id]
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            due = sorted(
+                (
+                    tracked
+                    for tracked in self.jobs.values()
+                    if not is_terminal(tracked.state) and tracked.next_poll <= now
+                ),
+                key=lambda tracked: tracked.next_poll,
+            )[: Settings.job_poll_batch]
+            if due:
+                await asyncio.gather(*[self._poll(tracked) for tracked in due])
+            self._evict(now)
+            await asyncio.sleep(Settings.job_poll_tick)
+
+    def stats(self) -> dict:
+        pending = sum(not is_terminal(job.state) for job in self.jobs.values())
+        return {
+            "tracked": len(self.jobs),
+            "pending": pending,
+            "subscribers": sum(len(q) for q in self.subscribers.values()),
+        }
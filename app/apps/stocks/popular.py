@@ -0,0 +1,152 @@
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from pymongo import UpdateOne
+from server import db
+from server.config import Settings
+from singleton import Singleton
+from utils.ratelimit import RateLimiter, RateLimiterRegistry
+
+from .cache import normalize_query
+from .manager import BaseStockImageManager
+
+
+class PopularQueries(metaclass=Singleton):
+    """Count searches and replay the most popular ones to warm the cache.
+
+    Requests only bump an in-memory counter; a background task adds the
+    counts to the Mongo `search_queries` collection every
+    `query_stats_flush` seconds, where queries not seen for
+    `query_stats_window` seconds expire. At startup `warm_up` replays the
+    top `warmup_queries` first pages through the manager's `search` at
+    `warmup_rate` searches per second.
+    """
+
+    collection_name = "search_queries"
+
+    def __init__(self):
+        self.enabled = Settings.query_stats
+        self.counts: Counter[tuple] = Counter()
+        self.flushed = 0
+        self.warmed = 0
+        self.warmup_errors = 0
+        self._tasks: list[asyncio.Task] = []
+
+    @property
+    def collection(self):
+        return db.get_db()[self.collection_name]
+
+    async def init_collection(self):
+        await self.collection.create_index(
+            "last_seen", expireAfterSeconds=Settings.query_stats_window
+        )
+        await self.collection.create_index("count")
+
+    def record(self, provider: str, q: str, limit: int, sort: str | None = None):
+        if self.enabled:
+            self.counts[(provider, normalize_query(q), limit, sort)] += 1
+
+    def start(self):
+        if self.enabled and not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._run()),
+                asyncio.create_task(self.warm_up()),
+            ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.flush()
+
+    async def flush(self):
+        counts, self.counts = self.counts, Counter()
+        if not counts:
+            return
+        now = datetime.now(timezone.utc)
+        operations = [
+            UpdateOne(
+                {"_id": f"{provider}:{q}:{limit}:{sort or ''}"},
+                {
+                    "$inc": {"count": count},
+                    "$set": {"last_seen": now},
+                    "$setOnInsert": {
+                        "provider": provider,
+                        "q": q,
+                        "limit": limit,
+                        "sort": sort,
+                    },
+                },
+                upsert=True,
+            )
+            for (provider, q, limit, sort), count in counts.items()
+        ]
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+            self.flushed += len(operations)
+        except Exception as e:
+            logging.warning(f"query stats flush: {e}")
+
+    async def top(self, n: int) -> list[dict]:
+        since = datetime.now(timezone.utc) - timedelta(
+            seconds=Settings.query_stats_window
+        )
+        cursor = (
+            self.collection.find({"last_seen": {"$gte": since}})
+            .sort("count", -1)
+            .limit(n)
+        )
+        return await cursor.to_list(length=n)
+
+    async def warm_up(self):
+        try:
+            queries = await self.top(Settings.warmup_queries)
+        except Exception as e:
+            logging.warning(f"cache warm-up: {e}")
+            return
+
+        limiter = RateLimiter(
+            **RateLimiterRegistry.partition(
+                {
+                    "rate": Settings.warmup_rate,
+                    "burst": 1,
+                    "max_in_flight": Settings.warmup_concurrency,
+                },
+                Settings.workers,
+            )
+        )
+
+        async def replay(query: dict):
+            manager = BaseStockImageManager.registry.get(query["provider"])
+            if manager is None:
+                return
+            params = {"q": query["q"], "page": 1, "limit": query["limit"]}
+            if query.get("sort"):
+                params["sort"] = query["sort"]
+            async with limiter.limit():
+                try:
+                    await manager().search(**params)
+                    self.warmed += 1
+                except Exception as e:
+                    self.warmup_errors += 1
+                    logging.warning(f"cache warm-up {query['_id']}: {e}")
+
+        await asyncio.gather(*[replay(query) for query in queries])
+        logging.info(f"cache warm-up: {self.warmed}/{len(queries)} queries")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(Settings.query_stats_flush)
+            await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "pending": len(self.counts),
+            "flushed": self.flushed,
+            "warmed": self.warmed,
+            "warmup_errors": self.warmup_errors,
+        }
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+
+from server.config import Settings
+from singleton import Singleton
+
+from .cache import SearchCache
+
+
+class SearchPrefetcher(metaclass=Singleton):
+    """Warm the next search page into `SearchCache` in the background.
+
+    At most `search_prefetch_concurrency` prefetches run at a time. A
+    prefetch is skipped, never queued, when that limit is reached, when the
+    provider limiter is above `search_prefetch_max_load` or when it was
+    throttled recently, so it only spends spare upstream budget. Pages
+    larger than `search_prefetch_max_limit` or than the provider's own page
+    size are never prefetched.
+    """
+
+    def __init__(self):
+        self.enabled = Settings.search_prefetch
+        self.max_load = Settings.search_prefetch_max_load
+        self.concurrency = Settings.search_prefetch_concurrency
+        self.tasks: set[asyncio.Task] = set()
+        self.scheduled = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def schedule(self, manager, q: str, page: int, limit: int, **kwargs) -> bool:
+        if not self.enabled:
+            return False
+        if limit > min(Settings.search_prefetch_max_limit, manager.page_size):
+            return False
+        key = manager.search_key(q, page, limit, **kwargs)
+        if key in SearchCache():
+            return False
+
+        limiter = manager.limiter
+        if (
+            len(self.tasks) >= self.concurrency
+            or limiter.load >= self.max_load
+            or limiter.throttled_recently
+        ):
+            self.skipped += 1
+            return False
+
+        task = asyncio.create_task(
+            self._prefetch(manager, key, q=q, page=page, limit=limit, **kwargs)
+        )
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        self.scheduled += 1
+        return True
+
+    async def _prefetch(self, manager, key: str, **kwargs):
+        try:
+            await SearchCache().get_or_fetch(key, lambda: manager._search(**kwargs))
+        except Exception as e:
+            self.failed += 1
+            logging.warning(f"search prefetch {key}: {e}")
+
+    async def stop(self):
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "scheduled": self.scheduled,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "running": len(self.tasks),
+        }
@@ -1,14 +1,42 @@
+import json
 import logging
+from contextlib import aclosing
 from typing import Literal
 
 import fastapi
 from core import exceptions
+from core.auth import JWTVerifier, jwt_access_security
+from core.responses import FastJSONResponse
+from fastapi.responses import StreamingResponse
+from server import log
+from server.config import Settings
 from usso import UserData
-from usso.fastapi.integration import jwt_access_security
+from utils.ratelimit import RateLimiterRegistry
+from utils.resilience import HostPolicies
 
+from .batch import batch_search
+from .cache import DownloadCache, ResourceCache, SearchCache
+from .catalogue import Catalogue
+from .decodl import is_terminal, job_file_url
+from .federation import federated_search
+from .files import FileProxy
 from .freepik import FreePikManager
-from .schemas import StockImage, StockImageRequest
+from .groups import DownloadGroups
+from .jobs import JobTracker
+from .manager import BaseStockImageManager
+from .popular import PopularQueries
+from .prefetch import SearchPrefetcher
+from .schemas import (
+    BatchSearchRequest,
+    BatchSearchResponse,
+    BulkDownloadRequest,
+    DownloadGroupStatus,
+    FederatedSearchResponse,
+    StockImage,
+    StockImageRequest,
+)
 from .shutterstock import ShutterStockManager
+from .taskqueue import DownloadQueue, public
 
 router = fastapi.APIRouter(
     tags=["Stock images"],
@@ -18,6 +46,24 @@ router = fastapi.APIRouter(
 )
 
 
+@router.get("/search", response_model=FederatedSearchResponse)
+async def search_all(
+    request: fastapi.Request,
+    q: str,
+    page: int = 1,
+    limit: int = 10,
+    timeout: float = Settings.federated_search_timeout,
+    _: UserData = fastapi.Depends(jwt_access_security),
+):
+    logging.info(f"federated search params: {dict(request.query_params)}")
+    result = await federated_search(
+        q=q, page=page, limit=limit, timeout=max(0.0, timeout)
+    )
+    if Settings.fast_json:
+        return FastJSONResponse(result)
+    return result
+
+
 @router.get("/{provider}/search", response_model=list[StockImage])
 async def search(
     request: fastapi.Request,
@@ -25,18 +71,23 @@ async def search(
     q: str,
     page: int = 1,
     limit: int = 10,
+    detail: Literal["lite", "full"] = "full",
+    source: Literal["upstream", "catalogue"] = "upstream",
     _: UserData = fastapi.Depends(jwt_access_security),
 ):
     params = dict(request.query_params)
+    params.pop("source", None)
     params["page"] = page
     params["limit"] = limit
+    params["detail"] = detail
     logging.info(f"search params: {params}")
+    PopularQueries().record(provider, q, limit, params.get("sort"))
     try:
         match provider:
             case "freepik":
-                return await FreePikManager().search(**params)
+                manager = FreePikManager()
             case "shutterstock":
-                return await ShutterStockManager().search(**params)
+                manager = ShutterStockManager()
             case _:
                 raise exceptions.BaseHTTPException(
                     status_code=400,
@@ -44,6 +95,15 @@ async def search(
                     message=f"Unknown provider {provider}",
                 )
 
+        if source == "catalogue":
+            stock_images = await manager.search_catalogue(**params)
+            if Settings.fast_json:
+                return FastJSONResponse(stock_images)
+            return stock_images
+        if Settings.fast_json:
+            return FastJSONResponse(await manager.search_json(**params))
+        return await manager.search(**params)
+
     except Exception as e:
         logging.error(f"image query: {e}")
 
@@ -54,6 +114,87 @@ async def search(
         )
 
 
+@router.post("/{provider}/search/batch", response_model=BatchSearchResponse)
+async def search_batch(
+    request: fastapi.Request,
+    provider: Literal["freepik", "shutterstock"],
+    batch: BatchSearchRequest,
+    _: UserData = fastapi.Depends(jwt_access_security),
+):
+    logging.info(f"batch search: {provider} {len(batch.queries)} queries")
+    manager = BaseStockImageManager.registry[provider]()
+    result = await batch_search(
+        manager, batch.queries, concurrency=Settings.batch_search_concurrency
+    )
+    if Settings.fast_json:
+        return FastJSONResponse(result)
+    return result
+
+
+@router.get("/{provider}/search/stream")
+async def search_stream(
+    request: fastapi.Request,
+    provider: Literal["freepik", "shutterstock"],
+    q: str,
+    page: int = 1,
+    limit: int = 10,
+    format: Literal["ndjson", "sse"] = "ndjson",
+    detail: Literal["lite", "full"] = "full",
+    _: UserData = fastapi.Depends(jwt_access_security),
+):
+    params = dict(request.query_params)
+    params.pop("format", None)
+    params["page"] = page
+    params["limit"] = limit
+    params["detail"] = detail
+    logging.info(f"search stream params: {params}")
+    manager = BaseStockImageManager.registry[provider]()
+
+    async def stream():
+        async with aclosing(manager.search_stream(**params)) as stock_images:
+            try:
+                async for image in stock_images:
+                    if await request.is_disconnected():
+                        break
+                    data = image.model_dump_json()
+                    yield f"data: {data}\n\n" if format == "sse" else f"{data}\n"
+            except Exception as e:
+                logging.error(f"search stream: {e}")
+                data = json.dumps({"error": "Exception", "message": str(e)})
+                if format == "sse":
+                    yield f"event: error\ndata: {data}\n\n"
+                else:
+                    yield f"{data}\n"
+                return
+
+        if format == "sse":
+            yield "event: end\ndata: {}\n\n"
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(stream(), media_type=media_type)
+
+
+@router.get("/{provider}/hydrate", response_model=list[StockImage])
+async def hydrate(
+    request: fastapi.Request,
+    provider: Literal["freepik", "shutterstock"],
+    ids: list[int] = fastapi.Query(max_length=Settings.page_max_limit),
+    _: UserData = fastapi.Depends(jwt_access_security),
+):
+    manager = BaseStockImageManager.registry[provider]()
+    try:
+        stock_images = await manager.hydrate(list(dict.fromkeys(ids)))
+    except NotImplementedError:
+        raise exceptions.BaseHTTPException(
+            status_code=400,
+            error="Bad Request",
+            message=f"Hydration is not supported for {provider}",
+        )
+    if Settings.fast_json:
+        return FastJSONResponse(stock_images)
+    return stock_images
+
+
 @router.post("/{provider}/download")
 async def download_image(
     request: fastapi.Request,
@@ -61,11 +202,16 @@ async def download_image(
     code: StockImageRequest,
     _: UserData = fastapi.Depends(jwt_access_security),
 ):
+    if DownloadQueue().enabled:
+        doc = await DownloadQueue().enqueue(provider, code.id)
+        # same Decodl job body as inline downloads once a worker submitted it
+        return doc["job"] or public(doc)
+
     match provider:
         case "freepik":
-            return await FreePikManager().download(code.id)
+            job = await FreePikManager().download(code.id)
         case "shutterstock":
-            return await ShutterStockManager().download(code.id)
+            job = await ShutterStockManager().download(code.id)
         case _:
             raise exceptions.BaseHTTPException(
                 status_code=400,
@@ -73,6 +219,74 @@ async def download_image(
                 message=f"Unknown provider {provider}",
             )
 
+    tracked = await JobTracker().track(provider, job)
+    # a memoized download may be older than the tracked state
+    return tracked.state if tracked is not None else job
+
+
+@router.post(
+    "/{provider}/download/bulk",
+    response_model=DownloadGroupStatus,
+    status_code=202,
+)
+async def download_bulk(
+    request: fastapi.Request,
+    provider: Literal["freepik", "shutterstock"],
+    bulk: BulkDownloadRequest,
+    _: UserData = fastapi.Depends(jwt_access_security),
+):
+    logging.info(f"bulk download: {provider} {len(bulk.ids)} codes")
+    group = await DownloadGroups().create(provider, bulk.ids)
+    return await DownloadGroups().status(group["_id"])
+
+
+@router.get("/{provider}/download/group/{group_id}", response_model=DownloadGroupStatus)
+async def get_download_group(
+    request: fastapi.Request,
+    provider: Literal["freepik", "shutterstock"],
+    group_id: str,
+    _: UserData = fastapi.Depends(jwt_access_security),
+):
+    status = await DownloadGroups().status(group_id)
+    if status is None or status.provider != provider:
+        raise exceptions.BaseHTTPException(
+            status_code=404,
+            error="Not Found",
+            message=f"Download group {group_id} not found",
+        )
+    return status
+
+
+@router.get("/{provider}/download/queued/{code}")
+async def get_queued_download(
+    request: fastapi.Request,
+    provider: Literal["freepik", "shutterstock"],
+    code: int,
+    _: UserData = fastapi.Depends(jwt_access_security),
+):
+    doc = await DownloadQueue().get(provider, code)
+    if doc is None:
+        raise exceptions.BaseHTTPException(
+            status_code=404,
+            error="Not Found",
+            message=f"Download {provider}:{code} is not queued",
+        )
+    return public(doc)
+
+
+async def job_state(provider: str, job_id: str) -> dict:
+    """Read a job from the download queue when enabled, else from the tracker.
+
+    The tracker loop does not run in queue mode, so jobs the queue does not
+    know are read straight from Decodl instead of being cached there.
+    """
+    if DownloadQueue().enabled:
+        doc = await DownloadQueue().get_by_job(job_id)
+        if doc is not None and doc.get("job"):
+            return doc["job"]
+        return await BaseStockImageManager.registry[provider]().get_job(job_id)
+    return await JobTracker().get(provider, job_id)
+
 
 @router.get("/{provider}/download/{job_id}")
 async def get_job_status(
@@ -82,17 +296,7 @@ async def get_job_status(
     _: UserData = fastapi.Depends(jwt_access_security),
 ):
     try:
-        match provider:
-            case "freepik":
-                return await FreePikManager().get_job(job_id)
-            case "shutterstock":
-                return await ShutterStockManager().get_job(job_id)
-            case _:
-                raise exceptions.BaseHTTPException(
-                    status_code=400,
-                    error="Bad Request",
-                    message=f"Unknown provider {provider}",
-                )
+        return await job_state(provider, job_id)
 
     except Exception as e:
         logging.error(f"job: {e}")
@@ -102,3 +306,85 @@ async def get_job_status(
             error="Bad Request",
             message=f"Could not create your request. {e}",
         )
+
+
+@router.get("/{provider}/download/{job_id}/events")
+async def get_job_events(
+    request: fastapi.Request,
+    provider: Literal["freepik", "shutterstock"],
+    job_id: str,
+    _: UserData = fastapi.Depends(jwt_access_security),
+):
+    if DownloadQueue().enabled:
+        subscription = DownloadQueue().watch(job_id)
+    else:
+        subscription = JobTracker().subscribe(provider, job_id)
+
+    async def stream():
+        async with aclosing(subscription) as states:
+            try:
+                async for state in states:
+                    if await request.is_disconnected():
+                        break
+                    yield f"data: {json.dumps(state)}\n\n"
+                    if "unknown_status" in state:
+                        data = json.dumps(
+                            {"error": "UnknownStatus", "message": state["error"]}
+                        )
+                        yield f"event: error\ndata: {data}\n\n"
+                        return
+            except Exception as e:
+                logging.error(f"job events: {e}")
+                data = json.dumps({"error": "Exception", "message": str(e)})
+                yield f"event: error\ndata: {data}\n\n"
+                return
+
+        yield "event: end\ndata: {}\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+@router.get("/{provider}/download/{job_id}/file")
+async def get_job_file(
+    request: fastapi.Request,
+    provider: Literal["freepik", "shutterstock"],
+    job_id: str,
+    _: UserData = fastapi.Depends(jwt_access_security),
+):
+    job = await job_state(provider, job_id)
+    url = job_file_url(job)
+    if url is None and not is_terminal(job):
+        raise exceptions.BaseHTTPException(
+            status_code=409,
+            error="Conflict",
+            message=f"Job {job_id} is not finished yet",
+        )
+    if url is None:
+        raise exceptions.BaseHTTPException(
+            status_code=404,
+            error="Not Found",
+            message=f"Job {job_id} has no downloadable file",
+        )
+    return await FileProxy().serve(request, f"{provider}:{job_id}", url)
+
+
+@router.get("/cache/stats")
+async def cache_stats(
+    request: fastapi.Request,
+    _: UserData = fastapi.Depends(jwt_access_security),
+):
+    return {
+        "search": SearchCache().stats(),
+        "resource": ResourceCache().stats(),
+        "rate_limits": RateLimiterRegistry().stats(),
+        "upstreams": HostPolicies().stats(),
+        "downloads": DownloadCache().stats(),
+        "jobs": JobTracker().stats(),
+        "download_groups": DownloadGroups().stats(),
+        "files": FileProxy().stats(),
+        "prefetch": SearchPrefetcher().stats(),
+        "popular_queries": PopularQueries().stats(),
+        "catalogue": Catalogue().stats(),
+        "auth": JWTVerifier().stats(),
+        "logging": log.stats(),
+    }
@@ -1,4 +1,7 @@
-from pydantic import BaseModel
+from typing import Literal
+
+from pydantic import BaseModel, Field
+from server.config import Settings
 
 
 class StockBaseImage(BaseModel):
@@ -15,3 +18,70 @@ class StockImage(BaseModel):
 
 class StockImageRequest(BaseModel):
     id: int
+
+
+class FederatedStockImage(StockImage):
+    provider: str
+
+
+class ProviderSearchStatus(BaseModel):
+    status: Literal["ok", "timeout", "error"]
+    count: int = 0
+    elapsed: float
+    error: str | None = None
+
+
+class FederatedSearchResponse(BaseModel):
+    results: list[FederatedStockImage]
+    providers: dict[str, ProviderSearchStatus]
+
+
+class SearchQuery(BaseModel):
+    q: str
+    page: int = 1
+    limit: int = 10
+    sort: str | None = None
+
+    @property
+    def key(self) -> str:
+        return f"{self.q}:{self.page}:{self.limit}:{self.sort or ''}"
+
+
+class BatchSearchRequest(BaseModel):
+    queries: list[SearchQuery] = Field(
+        min_length=1, max_length=Settings.batch_search_max_queries
+    )
+
+
+class BatchSearchResult(BaseModel):
+    query: SearchQuery
+    status: Literal["ok", "error"]
+    results: list[StockImage] = []
+    error: str | None = None
+
+
+class BatchSearchResponse(BaseModel):
+    results: dict[str, BatchSearchResult]
+
+
+class BulkDownloadRequest(BaseModel):
+    ids: list[int] = Field(min_length=1, max_length=Settings.bulk_download_max_items)
+
+
+class DownloadGroupItem(BaseModel):
+    code: int
+    job_id: str | None = None
+    status: Literal["submitting", "pending", "completed", "failed", "error"]
+    error: str | None = None
+    url: str | None = None
+
+
+class DownloadGroupStatus(BaseModel):
+    group_id: str
+    provider: str
+    total: int
+    completed: int
+    failed: int
+    pending: int
+    done: bool
+    items: list[DownloadGroupItem]
@@ -6,17 +6,19 @@ from .schemas import StockBaseImage, StockImage
 
 
 class ShutterStockManager(BaseStockImageManager):
+    provider = "shutterstock"
+    page_size = 500
+
     def __init__(self, api_key: str = Settings.SHUTTERSTOCK_API_KEY):
         super().__init__(api_key)
         self.api_key = api_key
-        self.base_url = "https://api.shutterstock.com/v2/images/search"
+        self.base_url = Settings.SHUTTERSTOCK_BASE_URL
         self.headers = {
             "Accept-Language": "en-US",
             "Accept": "application/json",
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.api_key}",
         }
-        self.provider = "shutterstock"
 
     async def get_row(self, row: dict, session: aiohttp.ClientSession = None):
         id = row.get("id")
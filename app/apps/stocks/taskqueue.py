@@ -0,0 +1,276 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator
+
+from pymongo import ReturnDocument
+from server import db
+from server.config import Settings
+from singleton import Singleton
+
+from .cache import DownloadCache
+from .decodl import (
+    give_up_unknown,
+    is_failed,
+    is_terminal,
+    is_unknown,
+    job_id_of,
+    job_status,
+)
+from .manager import BaseStockImageManager
+
+QUEUED = "queued"
+POLLING = "polling"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+def now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def public(doc: dict) -> dict:
+    return {
+        "id": doc["_id"],
+        "provider": doc["provider"],
+        "code": doc["code"],
+        "status": doc["status"],
+        "job_id": doc.get("job_id"),
+        "job": doc.get("job"),
+        "attempts": doc.get("attempts", 0),
+        "error": doc.get("error"),
+    }
+
+
+class DownloadQueue(metaclass=Singleton):
+    """Durable Decodl download queue stored in Mongo.
+
+    One document per provider and code moves from `queued` (submit to
+    Decodl) to `polling` (follow the job) to `completed` or `failed`.
+    Workers claim due documents with a lease; a worker that dies loses its
+    lease and the document is claimed again. Failed attempts are retried
+    with backoff up to `download_queue_max_attempts` times.
+    """
+
+    collection_name = "download_queue"
+
+    def __init__(self):
+        self.enabled = Settings.download_queue
+
+    @property
+    def collection(self):
+        return db.get_db()[self.collection_name]
+
+    async def init_collection(self):
+        await self.collection.create_index([("status", 1), ("next_run_at", 1)])
+        await self.collection.create_index("job_id")
+
+    async def enqueue(self, provider: str, code) -> dict:
+        """Queue a download once.
+
+        Failed downloads are queued again, and so are completed ones older
+        than `download_cache_ttl`, whose Decodl file link has expired.
+        """
+        key = DownloadCache.make_key(provider, code)
+        fields = {
+            "provider": provider,
+            "code": code,
+            "status": QUEUED,
+            "job_id": None,
+            "job": None,
+            "attempts": 0,
+            "error": None,
+            "interval": Settings.job_poll_interval,
+            "unknown_since": None,
+            "next_run_at": now(),
+            "lease_until": now(),
+            "lease_id": None,
+            "updated_at": now(),
+        }
+        doc = await self.collection.find_one_and_update(
+            {"_id": key},
+            {"$setOnInsert": {**fields, "created_at": now()}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc["status"] in (FAILED, COMPLETED):
+            expired = now() - timedelta(seconds=Settings.download_cache_ttl)
+            doc = await self.collection.find_one_and_update(
+                {
+                    "_id": key,
+                    "$or": [
+                        {"status": FAILED},
+                        {"status": COMPLETED, "updated_at": {"$lt": expired}},
+                    ],
+                },
+                {"$set": fields},
+                return_document=ReturnDocument.AFTER,
+            ) or await self.collection.find_one({"_id": key})
+        return doc
+
+    async def get(self, provider: str, code) -> dict | None:
+        return await self.collection.find_one(
+            {"_id": DownloadCache.make_key(provider, code)}
+        )
+
+    async def get_by_job(self, job_id: str) -> dict | None:
+        return await self.collection.find_one({"job_id": job_id})
+
+    async def watch(self, job_id: str) -> AsyncIterator[dict]:
+        """Yield the job state whenever a worker records a change."""
+        state = None
+        while True:
+            doc = await self.get_by_job(job_id)
+            if doc is not None and doc.get("job") != state:
+                state = doc["job"]
+                yield state
+                if is_terminal(state):
+                    return
+            await asyncio.sleep(Settings.job_poll_interval)
+
+    async def claim(self, worker_id: str) -> dict | None:
+        return await self.collection.find_one_and_update(
+            {
+                "status": {"$in": [QUEUED, POLLING]},
+                "next_run_at": {"$lte": now()},
+                "lease_until": {"$lte": now()},
+            },
+            {
+                "$set": {
+                    "lease_id": uuid.uuid4().hex,
+                    "lease_until": now()
+                    + timedelta(seconds=Settings.download_queue_lease),
+                    "worker": worker_id,
+                }
+            },
+            sort=[("next_run_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _release(self, doc: dict, update: dict):
+        update.update(lease_until=now(), lease_id=None, updated_at=now())
+        await self.collection.update_one(
+            {"_id": doc["_id"], "lease_id": doc["lease_id"]}, {"$set": update}
+        )
+
+    async def record(self, doc: dict, job_id: str, state: dict):
+        unknown_since = None
+        if is_unknown(state):
+            unknown_since = doc.get("unknown_since") or time.time()
+            if doc.get("unknown_since") is None:
+                logging.warning(
+                    f"download queue {doc['_id']}: unknown status {job_status(state)!r}"
+                )
+            elif time.time() - unknown_since > Settings.job_unknown_status_timeout:
+                state = give_up_unknown(state)
+
+        if is_terminal(state):
+            status = FAILED if is_failed(state) else COMPLETED
+            await DownloadCache().update_job(job_id, state)
+            await self._release(doc, {"status": status, "job_id": job_id, "job": state})
+            return
+
+        interval = Settings.job_poll_interval
+        if state == doc.get("job"):
+            interval = min(
+                Settings.job_poll_max_interval,
+                doc.get("interval", interval) * Settings.job_poll_backoff,
+            )
+        await self._release(
+            doc,
+            {
+                "status": POLLING,
+                "job_id": job_id,
+                "job": state,
+                "attempts": 0,
+                "error": None,
+                "interval": interval,
+                "unknown_since": unknown_since,
+                "next_run_at": now() + timedelta(seconds=interval),
+            },
+        )
+
+    async def retry(self, doc: dict, error: Exception):
+        attempts = doc.get("attempts", 0) + 1
+        update = {"attempts": attempts, "error": str(error) or type(error).__name__}
+        if attempts >= Settings.download_queue_max_attempts:
+            update["status"] = FAILED
+        else:
+            delay = Settings.download_queue_retry_backoff * 2 ** (attempts - 1)
+            update["next_run_at"] = now() + timedelta(seconds=delay)
+        await self._release(doc, update)
+
+
+class DownloadWorker:
+    """Claim queued downloads and drive them through Decodl.
+
+    Runs up to `download_worker_concurrency` documents at a time and polls
+    the queue every `download_worker_poll` seconds when it is idle.
+    """
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.queue = DownloadQueue()
+        self.semaphore = asyncio.Semaphore(Settings.download_worker_concurrency)
+        self.tasks: set[asyncio.Task] = set()
+        self.stopping = asyncio.Event()
+        self.processed = 0
+
+    def stop(self):
+        self.stopping.set()
+
+    async def run(self):
+        logging.info(f"download worker {self.worker_id} started")
+        while not self.stopping.is_set():
+            await self.semaphore.acquire()
+            try:
+                doc = await self.queue.claim(self.worker_id)
+            except Exception as e:
+                logging.error(f"download worker claim: {e}")
+                doc = None
+            if doc is None:
+                self.semaphore.release()
+                try:
+                    await asyncio.wait_for(
+                        self.stopping.wait(), Settings.download_worker_poll
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            task = asyncio.create_task(self.process(doc))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+            task.add_done_callback(lambda _: self.semaphore.release())
+
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        logging.info(f"download worker {self.worker_id} stopped")
+
+    async def process(self, doc: dict):
+        try:
+            await self._process(doc)
+        except Exception as e:
+            logging.error(f"download worker {doc['_id']}: {e}")
+
+    async def _process(self, doc: dict):
+        manager = BaseStockImageManager.registry[doc["provider"]]()
+        try:
+            if doc["status"] == QUEUED:
+                state = await manager.download(doc["code"])
+                job_id = job_id_of(state)
+                if job_id is None:
+                    raise ValueError("Decodl returned no job id")
+            else:
+                job_id = doc["job_id"]
+                state = await manager.get_job(job_id)
+        except Exception as e:
+            logging.warning(f"download worker {doc['_id']}: {e}")
+            await self.queue.retry(doc, e)
+            return
+
+        await self.queue.record(doc, job_id, state)
+        self.processed += 1
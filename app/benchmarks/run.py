@@ -0,0 +1,236 @@
+"""Load-test the API against local stub providers.
+
+Usage, from the `app` directory:
+
+    python -m benchmarks.run --scenario search --requests 2000 --concurrency 50
+
+The API is started with uvicorn in a subprocess whose upstream URLs point
+at in-process stub servers, so no paid API is called. Tokens are minted
+with a throwaway HS256 secret that the API is configured to accept.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import aiohttp
+import jwt
+
+from .stubs import Profile, StubProviders
+
+APP_DIR = Path(__file__).resolve().parent.parent
+BASE_PATH = "/v1/apps/stocks"
+JWT_SECRET = "benchmark-secret-" * 4
+
+SCENARIOS = {
+    "search": ("GET", "/freepik/search"),
+    "shutterstock": ("GET", "/shutterstock/search"),
+    "federated": ("GET", "/search"),
+    "stream": ("GET", "/freepik/search/stream"),
+    "download": ("POST", "/freepik/download"),
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(q / 100 * len(values)) - 1))
+    return values[index]
+
+
+def access_token() -> str:
+    return jwt.encode(
+        {
+            "user_id": "u_benchmark",
+            "token_type": "access",
+            "is_active": True,
+            "exp": int(time.time()) + 3600,
+        },
+        JWT_SECRET,
+        algorithm="HS256",
+    )
+
+
+def build_request(scenario: str, i: int, args) -> tuple[str, str, dict]:
+    method, path = SCENARIOS[scenario]
+    keyword = f"keyword-{random.randrange(args.distinct)}"
+    if method == "POST":
+        return method, path, {"json": {"id": random.randrange(args.distinct)}}
+    return method, path, {"params": {"q": keyword, "page": 1, "limit": args.limit}}
+
+
+async def wait_ready(session: aiohttp.ClientSession, url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(f"{url}{BASE_PATH}/health") as response:
+                if response.ok:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise TimeoutError("API did not start")
+
+
+async def run_load(url: str, scenario: str, args) -> dict:
+    latencies: list[float] = []
+    statuses: dict[int, int] = {}
+    headers = {"Authorization": f"Bearer {access_token()}"}
+    counter = iter(range(args.requests))
+
+    async def worker(session: aiohttp.ClientSession):
+        for i in counter:
+            method, path, kwargs = build_request(scenario, i, args)
+            started = time.perf_counter()
+            try:
+                async with session.request(
+                    method, f"{url}{BASE_PATH}{path}", headers=headers, **kwargs
+                ) as response:
+                    await response.read()
+                    status = response.status
+            except aiohttp.ClientError:
+                status = 0
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        started = time.perf_counter()
+        await asyncio.gather(*[worker(session) for _ in range(args.concurrency)])
+        elapsed = time.perf_counter() - started
+
+    return {
+        "scenario": scenario,
+        "requests": len(latencies),
+        "concurrency": args.concurrency,
+        "rps": len(latencies) / elapsed,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "statuses": statuses,
+    }
+
+
+def start_api(port: int, stubs: StubProviders, args) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        **stubs.env(),
+        "USSO_JWT_CONFIG": json.dumps(
+            {
+                "secret": JWT_SECRET,
+                "type": "HS256",
+                "header": {"type": "Authorization", "name": "Authorization"},
+            }
+        ),
+        "SEARCH_CACHE_MONGO": "false",
+        "DOWNLOAD_CACHE_MONGO": "false",
+    }
+    command = [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "app:app",
+        "--host",
+        "127.0.0.1",
+        "--port",
+        str(port),
+        "--log-level",
+        "warning",
+        "--no-access-log",
+    ]
+    return subprocess.Popen(command, cwd=APP_DIR, env=env)
+
+
+def print_report(results: list[dict], calls: dict):
+    columns = ["scenario", "requests", "concurrency", "rps"]
+    columns += ["mean_ms", "p50_ms", "p95_ms", "p99_ms"]
+    print(" ".join(f"{column:>12}" for column in columns) + "  statuses")
+    for result in results:
+        cells = [
+            (
+                f"{result[c]:>12.1f}"
+                if isinstance(result[c], float)
+                else f"{result[c]:>12}"
+            )
+            for c in columns
+        ]
+        print(" ".join(cells) + f"  {result['statuses']}")
+    print("\nupstream calls:")
+    for route, count in sorted(calls.items()):
+        print(f"  {count:>8}  {route}")
+
+
+async def main(args):
+    stubs = StubProviders(
+        Profile(
+            latency=args.latency,
+            jitter=args.jitter,
+            error_rate=args.error_rate,
+            throttle_rate=args.throttle_rate,
+            retry_after=args.retry_after,
+        )
+    )
+    runner = await stubs.start()
+    port = free_port()
+    api = start_api(port, stubs, args)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        async with aiohttp.ClientSession() as session:
+            await wait_ready(session, url)
+
+        results = []
+        for scenario in args.scenario:
+            results.append(await run_load(url, scenario, args))
+        print_report(results, dict(stubs.calls))
+        if args.output:
+            Path(args.output).write_text(json.dumps(results, indent=2))
+    finally:
+        api.terminate()
+        api.wait()
+        await runner.cleanup()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scenario",
+        nargs="+",
+        choices=SCENARIOS,
+        default=["search", "shutterstock", "federated"],
+    )
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument(
+        "--distinct",
+        type=int,
+        default=100,
+        help="number of distinct keywords or codes, controls the cache hit rate",
+    )
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
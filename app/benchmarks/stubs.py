@@ -0,0 +1,180 @@
+"""Local stand-ins for the Freepik, Shutterstock and Decodl APIs."""
+
+import asyncio
+import dataclasses
+import random
+import time
+import uuid
+from collections import Counter
+
+import jwt
+from aiohttp import web
+
+
+@dataclasses.dataclass
+class Profile:
+    """Latency and failure profile applied to every stub endpoint."""
+
+    latency: float = 0.05
+    jitter: float = 0.02
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    retry_after: float = 1.0
+    job_duration: float = 2.0
+    file_size: int = 1024 * 1024
+
+
+def _token(ttl: int = 3600) -> str:
+    return jwt.encode({"exp": int(time.time()) + ttl}, "stub-secret-" * 4)
+
+
+def _image(id: int) -> dict:
+    return {"url": f"https://img.stub/{id}.jpg", "width": 626, "height": 417}
+
+
+class StubProviders:
+    def __init__(self, profile: Profile | None = None):
+        self.profile = profile or Profile()
+        self.calls = Counter()
+        self.jobs: dict[str, dict] = {}
+
+    @web.middleware
+    async def chaos(self, request: web.Request, handler):
+        route = request.match_info.route.resource.canonical
+        self.calls[f"{request.method} {route}"] += 1
+
+        profile = self.profile
+        delay = profile.latency + random.uniform(-profile.jitter, profile.jitter)
+        await asyncio.sleep(max(0.0, delay))
+
+        roll = random.random()
+        if roll < profile.throttle_rate:
+            return web.json_response(
+                {"message": "Too many requests"},
+                status=429,
+                headers={"Retry-After": str(profile.retry_after)},
+            )
+        if roll < profile.throttle_rate + profile.error_rate:
+            return web.json_response({"message": "Stub failure"}, status=503)
+        return await handler(request)
+
+    def listing_ids(self, request: web.Request, size_key: str) -> list[int]:
+        page = int(request.query.get("page", 1))
+        limit = int(request.query.get(size_key, 20))
+        seed = sum(map(ord, request.query.get("term", request.query.get("query", ""))))
+        start = seed * 1000 + (page - 1) * limit
+        return list(range(start + 1, start + limit + 1))
+
+    async def freepik_list(self, request: web.Request):
+        data = [
+            {
+                "id": id,
+                "title": f"Stub resource {id}",
+                "image": {
+                    "type": "photo",
+                    "source": {"url": _image(id)["url"], "size": "626x417"},
+                },
+            }
+            for id in self.listing_ids(request, "limit")
+        ]
+        return web.json_response({"data": data})
+
+    async def freepik_detail(self, request: web.Request):
+        id = int(request.match_info["id"])
+        return web.json_response(
+            {
+                "data": {
+                    "id": id,
+                    "url": f"https://img.stub/{id}/original.jpg",
+                    "dimensions": {"width": 5000, "height": 3333},
+                    "preview": _image(id),
+                }
+            }
+        )
+
+    async def shutterstock_search(self, request: web.Request):
+        data = [
+            {
+                "id": id,
+                "assets": {
+                    "preview": _image(id),
+                    "preview_1500": {
+                        "url": f"https://img.stub/{id}/1500.jpg",
+                        "width": 1500,
+                        "height": 1000,
+                    },
+                },
+            }
+            for id in self.listing_ids(request, "per_page")
+        ]
+        return web.json_response({"data": data})
+
+    async def decodl_product(self, request: web.Request):
+        body = await request.json()
+        job_id = uuid.uuid4().hex
+        self.jobs[job_id] = {
+            "_id": job_id,
+            "code": body.get("code"),
+            "providerName": body.get("providerName"),
+            "created": time.monotonic(),
+        }
+        return web.json_response({"_id": job_id, "status": "pending"})
+
+    async def decodl_job(self, request: web.Request):
+        job = self.jobs.get(request.match_info["id"])
+        if job is None:
+            return web.json_response({"message": "Not found"}, status=404)
+
+        if time.monotonic() - job["created"] < self.profile.job_duration:
+            return web.json_response({"_id": job["_id"], "status": "processing"})
+        url = f"{request.scheme}://{request.host}/files/{job['_id']}"
+        return web.json_response(
+            {"_id": job["_id"], "status": "completed", "result": {"url": url}}
+        )
+
+    async def decodl_file(self, request: web.Request):
+        return web.Response(
+            body=b"\0" * self.profile.file_size, content_type="image/jpeg"
+        )
+
+    async def decodl_token(self, request: web.Request):
+        return web.json_response({"accessToken": _token()})
+
+    async def decodl_refresh(self, request: web.Request):
+        return web.json_response({"accessToken": _token(), "refreshToken": _token()})
+
+    def create_app(self) -> web.Application:
+        app = web.Application(middlewares=[self.chaos])
+        app.router.add_get("/freepik/v1/resources", self.freepik_list)
+        app.router.add_get("/freepik/v1/resources/{id}", self.freepik_detail)
+        app.router.add_get("/shutterstock/v2/images/search", self.shutterstock_search)
+        app.router.add_post("/decodl/api/product/dev", self.decodl_product)
+        app.router.add_get("/decodl/api/job/dev/{id}", self.decodl_job)
+        app.router.add_get("/files/{id}", self.decodl_file)
+        app.router.add_post(
+            "/decodl/api/auth/application/decodl/token", self.decodl_token
+        )
+        app.router.add_post("/decodl/api/auth/refresh", self.decodl_refresh)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> web.AppRunner:
+        runner = web.AppRunner(self.create_app(), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        self.base_url = f"http://{host}:{runner.addresses[0][1]}"
+        return runner
+
+    def env(self) -> dict[str, str]:
+        """Settings that point the managers at the stubs."""
+        return {
+            "FREEPIK_BASE_URL": f"{self.base_url}/freepik/v1/resources",
+            "SHUTTERSTOCK_BASE_URL": f"{self.base_url}/shutterstock/v2/images/search",
+            "DECODL_BASE_URL": f"{self.base_url}/decodl",
+            "FREEPIK_API_KEY": "stub",
+            "SHUTTERSTOCK_API_KEY": "stub",
+            "DECODL_APP_KEY": "stub",
+            "DECODL_APP_SECRET": _token(),
+            "DECODL_ACCESS_TOKEN": _token(),
+            "DECODL_REFRESH_TOKEN": _token(),
+        }
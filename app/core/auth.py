@@ -0,0 +1,188 @@
+import asyncio
+import json
+import logging
+import time
+
+import fastapi
+import jwt
+from core.exceptions import BaseHTTPException
+from pydantic import ValidationError
+from server.config import Settings
+from singleton import Singleton
+from starlette.status import HTTP_401_UNAUTHORIZED
+from usso import UserData
+from utils.aionetwork import aio_request
+from utils.cache import SingleFlight, TTLCache
+
+
+def unauthorized(error: str, message: str = None) -> BaseHTTPException:
+    return BaseHTTPException(
+        status_code=HTTP_401_UNAUTHORIZED, error=error, message=message or error
+    )
+
+
+class JWTVerifier(metaclass=Singleton):
+    """Verify access tokens against `Settings.JWT_CONFIG` with cached keys.
+
+    JWKS documents are fetched asynchronously and refreshed in the
+    background every `jwks_refresh_interval` seconds; an unknown `kid`
+    triggers an early refresh at most once per `jwks_min_refresh` seconds.
+    Verified tokens are kept in an LRU until their `exp`, so repeated
+    requests with the same token skip signature verification.
+    """
+
+    def __init__(self):
+        configs = json.loads(Settings.JWT_CONFIG)
+        self.configs: list[dict] = configs if isinstance(configs, list) else [configs]
+        self.cookie_names = {
+            config.get("header", {}).get("name", "usso_access_token")
+            for config in self.configs
+            if config.get("header", {}).get("type", "Cookie") == "Cookie"
+        } or {"usso_access_token"}
+        self.tokens = TTLCache(
+            maxsize=Settings.auth_cache_size, ttl=Settings.auth_cache_ttl, name="auth"
+        )
+        self.keys: dict[str, dict[str, jwt.PyJWK]] = {}
+        self.fetched_at: dict[str, float] = {}
+        self.flight = SingleFlight()
+        self.verifications = 0
+        self._task: asyncio.Task | None = None
+
+    @property
+    def jwk_urls(self) -> list[str]:
+        return [config["jwk_url"] for config in self.configs if config.get("jwk_url")]
+
+    def start(self):
+        if self.jwk_urls and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def request_token(self, request: fastapi.Request) -> str | None:
+        """The Bearer token of the request, else its access token cookie."""
+        scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() == "bearer" and credentials:
+            return credentials
+        for name in self.cookie_names:
+            token = request.cookies.get(name)
+            if token:
+                return token
+        return None
+
+    async def verify(self, token: str) -> UserData:
+        user = self.tokens.get(token)
+        if user is not None:
+            return user
+
+        error = None
+        for config in self.configs:
+            try:
+                payload = await self._decode(config, token)
+                break
+            except jwt.ExpiredSignatureError:
+                error = unauthorized("expired_signature")
+            except (jwt.InvalidTokenError, jwt.PyJWKError) as e:
+                error = unauthorized("invalid_token", str(e))
+            except Exception as e:
+                logging.error(f"token verification: {e}")
+                error = unauthorized("unauthorized", str(e))
+        else:
+            raise error or unauthorized("unauthorized")
+
+        try:
+            user = UserData(
+                **{
+                    **payload,
+                    "token_type": payload.get("token_type") or "access",
+                    "data": payload,
+                    "token": token,
+                }
+            )
+        except ValidationError as e:
+            raise unauthorized("invalid_token", str(e))
+        if user.token_type.lower() != "access":
+            raise unauthorized("invalid_token_type", "Token type must be 'access'")
+
+        ttl = Settings.auth_cache_ttl
+        if payload.get("exp") is not None:
+            ttl = min(ttl, payload["exp"] - time.time())
+        if ttl > 0:
+            self.tokens.set(token, user, ttl=ttl)
+        return user
+
+    async def _decode(self, config: dict, token: str) -> dict:
+        self.verifications += 1
+        if not config.get("jwk_url"):
+            algorithm = config.get("type", "HS256")
+            return jwt.decode(token, config.get("secret"), algorithms=[algorithm])
+
+        jwk_url = config["jwk_url"]
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = self._signing_key(jwk_url, kid)
+        if key is None and self._can_refresh(jwk_url):
+            await self.refresh(jwk_url)
+            key = self._signing_key(jwk_url, kid)
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unknown signing key {kid}")
+        algorithm = key.algorithm_name or config.get("type", "RS256")
+        return jwt.decode(token, key.key, algorithms=[algorithm])
+
+    def _signing_key(self, jwk_url: str, kid: str | None) -> jwt.PyJWK | None:
+        """Key for `kid`; tokens without one use the only key of the JWKS."""
+        keys = self.keys.get(jwk_url, {})
+        if kid is None and len(keys) == 1:
+            return next(iter(keys.values()))
+        return keys.get(kid)
+
+    def _can_refresh(self, jwk_url: str) -> bool:
+        fetched_at = self.fetched_at.get(jwk_url)
+        return fetched_at is None or time.monotonic() - fetched_at > (
+            Settings.jwks_min_refresh
+        )
+
+    async def refresh(self, jwk_url: str):
+        await self.flight.do(jwk_url, self._refresh, jwk_url)
+
+    async def _refresh(self, jwk_url: str):
+        self.fetched_at[jwk_url] = time.monotonic()
+        jwks = await aio_request(url=jwk_url)
+        keys = {}
+        for data in jwks.get("keys", []):
+            try:
+                key = jwt.PyJWK(data)
+            except jwt.PyJWKError:
+                continue
+            keys[key.key_id] = key
+        self.keys[jwk_url] = keys
+
+    async def _run(self):
+        while True:
+            for jwk_url in self.jwk_urls:
+                try:
+                    await self.refresh(jwk_url)
+                except Exception as e:
+                    logging.error(f"jwks refresh {jwk_url}: {e}")
+            await asyncio.sleep(Settings.jwks_refresh_interval)
+
+    def stats(self) -> dict:
+        return {
+            "tokens": self.tokens.stats(),
+            "verifications": self.verifications,
+            "keys": {url: len(keys) for url, keys in self.keys.items()},
+        }
+
+
+async def jwt_access_security(request: fastapi.Request) -> UserData:
+    """Return the user of the request token, verifying it at most once."""
+    verifier = JWTVerifier()
+    token = verifier.request_token(request)
+    if not token:
+        raise unauthorized("unauthorized", "No token provided")
+    return await verifier.verify(token)
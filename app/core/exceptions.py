@@ -2,10 +2,17 @@ error_messages = {}
 
 
 class BaseHTTPException(Exception):
-    def __init__(self, status_code: int, error: str, message: str = None):
+    def __init__(
+        self,
+        status_code: int,
+        error: str,
+        message: str = None,
+        headers: dict[str, str] | None = None,
+    ):
         self.status_code = status_code
         self.error = error
         self.message = message
+        self.headers = headers
         if message is None:
             self.message = error_messages[error]
         super().__init__(message)
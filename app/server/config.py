@@ -16,20 +16,36 @@ dotenv.load_dotenv()
 class Settings(metaclass=Singleton):
     """Server config settings."""
 
-    root_url: str = os.getenv("DOMAIN", default="http://localhost:8000")
-    mongo_uri: str = os.getenv("MONGO_URI", default="mongodb://mongo:27017/")
-    project_name: str = os.getenv("PROJECT_NAME", default="Stock Images")
+    root_url: str = os.getenv("DOMAIN") or "http://localhost:8000"
+    mongo_uri: str = os.getenv("MONGO_URI") or "mongodb://mongo:27017/"
+    mongo_db: str = os.getenv("MONGO_DB") or "stocks"
+    mongo_timeout_ms: int = int(os.getenv("MONGO_TIMEOUT_MS") or 2000)
+    project_name: str = os.getenv("PROJECT_NAME") or "Stock Images"
     base_dir: Path = Path(__file__).resolve().parent.parent
     base_path: str = "/v1/apps/stocks"
     page_max_limit: int = 100
+    production: bool = (os.getenv("PRODUCTION") or "false").lower() == "true"
 
     app_id: str = os.getenv("APP_ID")
     app_secret: str = os.getenv("APP_SECRET")
 
-    JWT_CONFIG: str = os.getenv(
-        "USSO_JWT_CONFIG",
-        default='{"jwk_url": "https://usso.io/website/jwks.json","type": "RS256","header": {"type": "Cookie", "name": "usso_access_token"} }',
+    JWT_CONFIG: str = (
+        os.getenv("USSO_JWT_CONFIG")
+        or '{"jwk_url": "https://usso.io/website/jwks.json","type": "RS256","header": {"type": "Cookie", "name": "usso_access_token"} }'
     )
+    auth_cache_size: int = int(os.getenv("AUTH_CACHE_SIZE") or 10000)
+    auth_cache_ttl: int = int(os.getenv("AUTH_CACHE_TTL") or 3600)
+    jwks_refresh_interval: int = int(os.getenv("JWKS_REFRESH_INTERVAL") or 600)
+    jwks_min_refresh: int = int(os.getenv("JWKS_MIN_REFRESH") or 30)
+
+    FREEPIK_BASE_URL: str = (
+        os.getenv("FREEPIK_BASE_URL") or "https://api.freepik.com/v1/resources"
+    )
+    SHUTTERSTOCK_BASE_URL: str = (
+        os.getenv("SHUTTERSTOCK_BASE_URL")
+        or "https://api.shutterstock.com/v2/images/search"
+    )
+    DECODL_BASE_URL: str = os.getenv("DECODL_BASE_URL") or "https://decodl.net"
 
     FREEPIK_API_KEY: str = os.getenv("FREEPIK_API_KEY")
     SHUTTERSTOCK_API_KEY: str = os.getenv("SHUTTERSTOCK_API_KEY")
@@ -38,7 +54,114 @@ class Settings(metaclass=Singleton):
     DECODL_ACCESS_TOKEN: str = os.getenv("DECODL_ACCESS_TOKEN")
     DECODL_REFRESH_TOKEN: str = os.getenv("DECODL_REFRESH_TOKEN")
 
-    testing: bool = os.getenv("TESTING", default=False)
+    http_pool_limit: int = int(os.getenv("HTTP_POOL_LIMIT") or 100)
+    http_pool_limit_per_host: int = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST") or 0)
+    http_keepalive_timeout: float = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT") or 30)
+    http_dns_cache_ttl: int = int(os.getenv("HTTP_DNS_CACHE_TTL") or 300)
+
+    search_cache_size: int = int(os.getenv("SEARCH_CACHE_SIZE") or 1024)
+    search_cache_ttl: int = int(os.getenv("SEARCH_CACHE_TTL") or 600)
+    # production workers share hot search pages through Mongo
+    search_cache_mongo: bool = (
+        os.getenv("SEARCH_CACHE_MONGO") or str(production)
+    ).lower() == "true"
+    search_prefetch: bool = (os.getenv("SEARCH_PREFETCH") or "false").lower() == "true"
+    search_prefetch_concurrency: int = int(
+        os.getenv("SEARCH_PREFETCH_CONCURRENCY") or 2
+    )
+    search_prefetch_max_limit: int = int(os.getenv("SEARCH_PREFETCH_MAX_LIMIT") or 20)
+    search_prefetch_max_load: float = float(
+        os.getenv("SEARCH_PREFETCH_MAX_LOAD") or 0.5
+    )
+    query_stats: bool = (os.getenv("QUERY_STATS") or "false").lower() == "true"
+    query_stats_flush: float = float(os.getenv("QUERY_STATS_FLUSH") or 30)
+    query_stats_window: int = int(os.getenv("QUERY_STATS_WINDOW") or 7 * 24 * 3600)
+    warmup_queries: int = int(os.getenv("WARMUP_QUERIES") or 50)
+    warmup_rate: float = float(os.getenv("WARMUP_RATE") or 2)
+    warmup_concurrency: int = int(os.getenv("WARMUP_CONCURRENCY") or 2)
+    catalogue: bool = (os.getenv("CATALOGUE") or "false").lower() == "true"
+    catalogue_ttl: int = int(os.getenv("CATALOGUE_TTL") or 7 * 24 * 3600)
+    catalogue_max_pending: int = int(os.getenv("CATALOGUE_MAX_PENDING") or 32)
+    resource_cache_size: int = int(os.getenv("RESOURCE_CACHE_SIZE") or 10000)
+    resource_cache_ttl: int = int(os.getenv("RESOURCE_CACHE_TTL") or 3600)
+    resource_cache_negative_ttl: int = int(
+        os.getenv("RESOURCE_CACHE_NEGATIVE_TTL") or 300
+    )
+    HTTP_TIMEOUTS: str = (
+        os.getenv("HTTP_TIMEOUTS")
+        or '{"default": {"connect": 5, "sock_read": 30}, "api.freepik.com": {"total": 10, "connect": 3}, "api.shutterstock.com": {"total": 10, "connect": 3}, "decodl.net": {"total": 20, "connect": 5}}'
+    )
+    http_retries: int = int(os.getenv("HTTP_RETRIES") or 2)
+    http_retry_backoff: float = float(os.getenv("HTTP_RETRY_BACKOFF") or 0.2)
+    http_retry_max_backoff: float = float(os.getenv("HTTP_RETRY_MAX_BACKOFF") or 2)
+    http_retry_budget_ratio: float = float(os.getenv("HTTP_RETRY_BUDGET_RATIO") or 0.2)
+    http_hedge_after: float = float(os.getenv("HTTP_HEDGE_AFTER") or 0)
+    http_breaker_threshold: int = int(os.getenv("HTTP_BREAKER_THRESHOLD") or 5)
+    http_breaker_reset: float = float(os.getenv("HTTP_BREAKER_RESET") or 30)
+
+    RATE_LIMITS: str = (
+        os.getenv("RATE_LIMITS")
+        or '{"default": {"rate": 10, "burst": 20, "max_in_flight": 10}, "decodl": {"rate": 5, "burst": 10, "max_in_flight": 5}}'
+    )
+    rate_limit_retries: int = int(os.getenv("RATE_LIMIT_RETRIES") or 2)
+    federated_search_timeout: float = float(os.getenv("FEDERATED_SEARCH_TIMEOUT") or 3)
+    batch_search_max_queries: int = int(os.getenv("BATCH_SEARCH_MAX_QUERIES") or 500)
+    batch_search_concurrency: int = int(os.getenv("BATCH_SEARCH_CONCURRENCY") or 8)
+    job_poll_interval: float = float(os.getenv("JOB_POLL_INTERVAL") or 2)
+    job_poll_max_interval: float = float(os.getenv("JOB_POLL_MAX_INTERVAL") or 30)
+    job_poll_backoff: float = float(os.getenv("JOB_POLL_BACKOFF") or 1.5)
+    job_poll_batch: int = int(os.getenv("JOB_POLL_BATCH") or 20)
+    job_poll_tick: float = float(os.getenv("JOB_POLL_TICK") or 0.5)
+    job_unknown_status_timeout: float = float(
+        os.getenv("JOB_UNKNOWN_STATUS_TIMEOUT") or 600
+    )
+    job_retention: int = int(os.getenv("JOB_RETENTION") or 3600)
+    download_cache_size: int = int(os.getenv("DOWNLOAD_CACHE_SIZE") or 10000)
+    download_cache_ttl: int = int(os.getenv("DOWNLOAD_CACHE_TTL") or 86400)
+    download_cache_mongo: bool = (
+        os.getenv("DOWNLOAD_CACHE_MONGO") or str(production)
+    ).lower() == "true"
+    bulk_download_max_items: int = int(os.getenv("BULK_DOWNLOAD_MAX_ITEMS") or 100)
+    bulk_download_concurrency: int = int(os.getenv("BULK_DOWNLOAD_CONCURRENCY") or 4)
+    download_queue: bool = (os.getenv("DOWNLOAD_QUEUE") or "false").lower() == "true"
+    download_queue_lease: int = int(os.getenv("DOWNLOAD_QUEUE_LEASE") or 60)
+    download_queue_max_attempts: int = int(
+        os.getenv("DOWNLOAD_QUEUE_MAX_ATTEMPTS") or 5
+    )
+    download_queue_retry_backoff: float = float(
+        os.getenv("DOWNLOAD_QUEUE_RETRY_BACKOFF") or 5
+    )
+    download_worker_concurrency: int = int(
+        os.getenv("DOWNLOAD_WORKER_CONCURRENCY") or 8
+    )
+    download_worker_poll: float = float(os.getenv("DOWNLOAD_WORKER_POLL") or 1)
+    decodl_refresh_margin: int = int(os.getenv("DECODL_REFRESH_MARGIN") or 300)
+    decodl_token_lifetime: int = int(os.getenv("DECODL_TOKEN_LIFETIME") or 3600)
+    decodl_refresh_retry: int = int(os.getenv("DECODL_REFRESH_RETRY") or 30)
+    download_chunk_size: int = int(os.getenv("DOWNLOAD_CHUNK_SIZE") or 1024 * 1024)
+    file_cache_enabled: bool = (
+        os.getenv("FILE_CACHE_ENABLED") or "false"
+    ).lower() == "true"
+    file_cache_dir: Path = Path(
+        os.getenv("FILE_CACHE_DIR") or base_dir / "cache" / "files"
+    )
+    file_cache_max_size: int = int(os.getenv("FILE_CACHE_MAX_SIZE") or 5 * 1024**3)
+    file_cache_max_file_size: int = int(
+        os.getenv("FILE_CACHE_MAX_FILE_SIZE") or 1024**3
+    )
+    fast_json: bool = (os.getenv("FAST_JSON") or "false").lower() == "true"
+    workers: int = int(os.getenv("WORKERS") or 1)
+    shared_state_dir: Path = Path(
+        os.getenv("SHARED_STATE_DIR") or base_dir / "cache" / "shared"
+    )
+    shared_state_poll: float = float(os.getenv("SHARED_STATE_POLL") or 5)
+
+    log_json: bool = (os.getenv("LOG_JSON") or "false").lower() == "true"
+    log_queue_size: int = int(os.getenv("LOG_QUEUE_SIZE") or 10000)
+    log_max_length: int = int(os.getenv("LOG_MAX_LENGTH") or 4096)
+    LOG_SAMPLING: str = os.getenv("LOG_SAMPLING") or "{}"
+
+    testing: bool = os.getenv("TESTING") or False
 
     log_config = {
         "version": 1,
@@ -46,13 +169,13 @@ class Settings(metaclass=Singleton):
             "console": {
                 "class": "logging.StreamHandler",
                 "level": "INFO",
-                "formatter": "standard",
+                "formatter": "json" if log_json else "standard",
             },
             "file": {
                 "class": "logging.FileHandler",
                 "level": "INFO",
                 "filename": base_dir / "logs" / "info.log",
-                "formatter": "standard",
+                "formatter": "json" if log_json else "standard",
             },
         },
         "formatters": {
@@ -60,7 +183,8 @@ class Settings(metaclass=Singleton):
                 "format": "[{levelname} : {filename}:{lineno} : {asctime} -> {funcName:10}] {message}",
                 # "format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
                 "style": "{",
-            }
+            },
+            "json": {"()": "server.log.JSONFormatter"},
         },
         "loggers": {
             "": {
@@ -1,2 +1,52 @@
+import logging
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+
+from .config import Settings
+
+client: AsyncIOMotorClient | None = None
+
+
+def get_db() -> AsyncIOMotorDatabase:
+    global client
+
+    if client is None:
+        client = AsyncIOMotorClient(
+            Settings.mongo_uri, serverSelectionTimeoutMS=Settings.mongo_timeout_ms
+        )
+    return client.get_database(Settings.mongo_db)
+
+
 async def init_db():
-    pass
+    from apps.stocks.cache import DownloadCache, SearchCache
+    from apps.stocks.catalogue import Catalogue
+    from apps.stocks.groups import DownloadGroups
+    from apps.stocks.popular import PopularQueries
+    from apps.stocks.taskqueue import DownloadQueue
+
+    collections = []
+    if Settings.search_cache_mongo:
+        collections.append(SearchCache())
+    if Settings.download_cache_mongo:
+        collections.append(DownloadCache())
+        collections.append(DownloadGroups())
+    if Settings.catalogue:
+        collections.append(Catalogue())
+    if Settings.query_stats:
+        collections.append(PopularQueries())
+    if Settings.download_queue:
+        collections.append(DownloadQueue())
+
+    for collection in collections:
+        try:
+            await collection.init_collection()
+        except Exception as e:
+            logging.error(f"init_db {collection.collection_name}: {e}")
+
+
+async def close_db():
+    global client
+
+    if client is not None:
+        client.close()
+        client = None
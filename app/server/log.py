@@ -0,0 +1,168 @@
+"""Queue-based logging: records are handed to a background writer thread."""
+
+import copy
+import json
+import logging
+import queue
+import random
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from .config import Settings
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "location": f"{record.filename}:{record.lineno}",
+            "function": record.funcName,
+            "process": record.process,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a share of the records below WARNING for configured sources.
+
+    Rules map a logger name, a module or `module.function` to the share of
+    records to keep, e.g. `{"routes.search": 0.1}`.
+    """
+
+    def __init__(self, rules: dict[str, float]):
+        super().__init__()
+        self.rules = rules
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not self.rules or record.levelno >= logging.WARNING:
+            return True
+        rate = self.rules.get(f"{record.module}.{record.funcName}")
+        if rate is None:
+            rate = self.rules.get(record.module, self.rules.get(record.name))
+        if rate is None or random.random() < rate:
+            return True
+        self.dropped += 1
+        return False
+
+
+class BoundedQueueHandler(QueueHandler):
+    """Queue handler that truncates messages and drops records when full."""
+
+    def __init__(self, log_queue: queue.Queue, max_length: int):
+        super().__init__(log_queue)
+        self.max_length = max_length
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Merge the args into the message, leaving `exc_info` to the writer.
+
+        `QueueHandler.prepare` would format the traceback into `msg` and
+        drop `exc_info`; the records stay in-process, so the writer's
+        formatter can render it instead and only the message is truncated.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if self.max_length and len(record.msg) > self.max_length:
+            truncated = len(record.msg) - self.max_length
+            record.msg = (
+                f"{record.msg[:self.max_length]}... [{truncated} chars truncated]"
+            )
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+# servers that install their own handlers; routed through the root queue
+SERVER_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+_listener: QueueListener | None = None
+_queue_handler: BoundedQueueHandler | None = None
+_server_handlers: dict[str, tuple[list[logging.Handler], bool, bool]] = {}
+
+
+def setup():
+    """Configure `Settings.log_config`, then move its handlers off-thread.
+
+    The uvicorn loggers, which `dictConfig` would otherwise leave disabled,
+    are made to propagate to the root queue as well, so no record is
+    written on the event loop thread.
+    """
+    global _listener, _queue_handler
+
+    Settings.config_logger()
+    for name in SERVER_LOGGERS:
+        logger = logging.getLogger(name)
+        _server_handlers[name] = (
+            logger.handlers[:],
+            logger.propagate,
+            logger.disabled,
+        )
+        for handler in logger.handlers[:]:
+            logger.removeHandler(handler)
+        logger.propagate = True
+        logger.disabled = False
+
+    root = logging.getLogger()
+    handlers = root.handlers[:]
+    for handler in handlers:
+        root.removeHandler(handler)
+
+    queue_handler = BoundedQueueHandler(
+        queue.Queue(Settings.log_queue_size), Settings.log_max_length
+    )
+    queue_handler.addFilter(SamplingFilter(json.loads(Settings.LOG_SAMPLING)))
+    root.addHandler(queue_handler)
+    _queue_handler = queue_handler
+
+    _listener = QueueListener(
+        queue_handler.queue, *handlers, respect_handler_level=True
+    )
+    _listener.start()
+
+
+def shutdown():
+    """Flush the queued records and write synchronously from now on."""
+    global _listener, _queue_handler
+
+    if _listener is None:
+        return
+    root = logging.getLogger()
+    root.removeHandler(_queue_handler)
+    _listener.stop()
+    for handler in _listener.handlers:
+        root.addHandler(handler)
+    for name, (handlers, propagate, disabled) in _server_handlers.items():
+        logger = logging.getLogger(name)
+        for handler in handlers:
+            logger.addHandler(handler)
+        logger.propagate = propagate
+        logger.disabled = disabled
+    _server_handlers.clear()
+    _listener = None
+    _queue_handler = None
+
+
+def stats() -> dict:
+    if _queue_handler is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "queued": _queue_handler.queue.qsize(),
+        "dropped": _queue_handler.dropped,
+        "sampled_out": sum(
+            getattr(log_filter, "dropped", 0) for log_filter in _queue_handler.filters
+        ),
+    }
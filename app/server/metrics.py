@@ -0,0 +1,98 @@
+"""Prometheus metrics for requests, upstream calls and caches."""
+
+import os
+
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import REGISTRY, CounterMetricFamily, GaugeMetricFamily
+
+REQUEST_LATENCY = Histogram(
+    "stocks_request_duration_seconds",
+    "Latency of API requests by route and provider.",
+    ["method", "route", "provider", "status"],
+)
+UPSTREAM_LATENCY = Histogram(
+    "stocks_upstream_request_duration_seconds",
+    "Latency of upstream HTTP requests by host.",
+    ["host", "method"],
+)
+UPSTREAM_RESPONSES = Counter(
+    "stocks_upstream_responses_total",
+    "Upstream HTTP responses by host and status, `error` for failed requests.",
+    ["host", "method", "status"],
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    "stocks_upstream_in_flight_requests",
+    "Upstream HTTP requests currently in flight by host.",
+    ["host"],
+    multiprocess_mode="livesum",
+)
+SEARCH_FANOUT = Histogram(
+    "stocks_search_fanout_rows",
+    "Number of get_row calls per search page.",
+    ["provider"],
+    buckets=(0, 1, 5, 10, 20, 50, 100),
+)
+
+
+class CacheCollector:
+    """Export the counters of every named `TTLCache` at scrape time."""
+
+    def collect(self):
+        from utils.cache import TTLCache
+
+        hits = CounterMetricFamily(
+            "stocks_cache_hits", "Cache hits by cache.", labels=["cache"]
+        )
+        misses = CounterMetricFamily(
+            "stocks_cache_misses", "Cache misses by cache.", labels=["cache"]
+        )
+        evictions = CounterMetricFamily(
+            "stocks_cache_evictions", "Cache evictions by cache.", labels=["cache"]
+        )
+        size = GaugeMetricFamily(
+            "stocks_cache_size", "Cache entries by cache.", labels=["cache"]
+        )
+        hit_ratio = GaugeMetricFamily(
+            "stocks_cache_hit_ratio", "Cache hit ratio by cache.", labels=["cache"]
+        )
+        for name, cache in TTLCache.registry.items():
+            stats = cache.stats()
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            evictions.add_metric([name], stats["evictions"])
+            size.add_metric([name], stats["size"])
+            hit_ratio.add_metric([name], stats["hit_ratio"])
+        yield from (hits, misses, evictions, size, hit_ratio)
+
+
+REGISTRY.register(CacheCollector())
+
+
+def multiprocess_dir() -> str | None:
+    return os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+
+def render() -> bytes:
+    """Render the metrics, merged across workers in multiprocess mode.
+
+    Cache metrics are collected live and so only cover the worker that
+    serves the scrape.
+    """
+    if not multiprocess_dir():
+        return generate_latest()
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(CacheCollector())
+    return generate_latest(registry)
+
+
+def mark_process_dead():
+    if multiprocess_dir():
+        multiprocess.mark_process_dead(os.getpid())
@@ -1,27 +1,59 @@
 import json
 import logging
+import time
 from contextlib import asynccontextmanager
 
 import fastapi
 import pydantic
+from apps.stocks.catalogue import Catalogue
+from apps.stocks.decodl import DecodlCredentials
+from apps.stocks.groups import DownloadGroups
+from apps.stocks.jobs import JobTracker
+from apps.stocks.manager import BaseStockImageManager
+from apps.stocks.popular import PopularQueries
+from apps.stocks.prefetch import SearchPrefetcher
 from core import exceptions
+from core.auth import JWTVerifier
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from json_advanced import dumps
+from prometheus_client import CONTENT_TYPE_LATEST
 from usso.exceptions import USSOException
+from utils.aionetwork import SessionPool
 
-from . import config, db
+from . import config, db, log, metrics
 
 
 @asynccontextmanager
 async def lifespan(app: fastapi.FastAPI):  # type: ignore
     """Initialize application services."""
-    config.Settings().config_logger()
+    log.setup()
     await db.init_db()
+    session_pool = SessionPool()
+    jwt_verifier = JWTVerifier()
+    jwt_verifier.start()
+    decodl_credentials = DecodlCredentials()
+    decodl_credentials.start()
+    job_tracker = JobTracker()
+    if not config.Settings.download_queue:
+        job_tracker.start()
+    popular_queries = PopularQueries()
+    popular_queries.start()
 
     logging.info("Startup complete")
     yield
+    await popular_queries.stop()
+    await Catalogue().stop()
+    await SearchPrefetcher().stop()
+    await DownloadGroups().stop()
+    await job_tracker.stop()
+    await decodl_credentials.stop()
+    await jwt_verifier.stop()
+    await session_pool.close()
+    await db.close_db()
+    metrics.mark_process_dead()
     logging.info("Shutdown complete")
+    log.shutdown()
 
 
 app = fastapi.FastAPI(
@@ -51,6 +83,7 @@ async def base_http_exception_handler(
     return JSONResponse(
         status_code=exc.status_code,
         content={"message": exc.message, "error": exc.error},
+        headers=exc.headers,
     )
 
 
@@ -93,6 +126,28 @@ async def general_exception_handler(request: fastapi.Request, exc: Exception):
     )
 
 
+@app.middleware("http")
+async def request_metrics(request: fastapi.Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        provider = request.path_params.get("provider", "")
+        # path params are raw client input; keep the label set bounded
+        if provider and provider not in BaseStockImageManager.registry:
+            provider = "other"
+        metrics.REQUEST_LATENCY.labels(
+            request.method,
+            getattr(route, "path", "unmatched"),
+            provider,
+            str(status),
+        ).observe(time.perf_counter() - started)
+
+
 origins = [
     "http://localhost:8000",
 ]
@@ -127,6 +182,11 @@ async def health(request: fastapi.Request):
     }
 
 
+@app.get(f"{config.Settings.base_path}/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return Response(metrics.render(), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.get("/openapi.json", include_in_schema=False)
 async def openapi():
     openapi = app.openapi()
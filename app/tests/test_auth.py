@@ -0,0 +1,109 @@
+import asyncio
+import base64
+
+import jwt
+import pytest
+from core.auth import JWTVerifier
+from core.exceptions import BaseHTTPException
+from singleton import Singleton
+from starlette.requests import Request
+
+SECRET = b"test-secret-that-is-long-enough-for-hs256"
+JWK_URL = "https://auth.example.com/jwks.json"
+
+
+def jwk(kid: str | None = None) -> jwt.PyJWK:
+    data = {
+        "kty": "oct",
+        "alg": "HS256",
+        "k": base64.urlsafe_b64encode(SECRET).rstrip(b"=").decode(),
+    }
+    if kid is not None:
+        data["kid"] = kid
+    return jwt.PyJWK(data)
+
+
+def make_verifier(*keys: jwt.PyJWK) -> JWTVerifier:
+    Singleton._instances.pop(JWTVerifier, None)
+    verifier = JWTVerifier()
+    verifier.configs = [{"jwk_url": JWK_URL, "type": "HS256"}]
+    verifier.keys = {JWK_URL: {key.key_id: key for key in keys}}
+    verifier.fetched_at = {JWK_URL: float("inf")}
+    return verifier
+
+
+def make_token(kid: str | None = None, **claims) -> str:
+    headers = {"kid": kid} if kid is not None else None
+    return jwt.encode({"user_id": "u1", **claims}, SECRET, headers=headers)
+
+
+def make_request(headers: dict) -> Request:
+    raw = [(name.lower().encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "headers": raw})
+
+
+def verify(verifier: JWTVerifier, token: str):
+    return asyncio.run(verifier.verify(token))
+
+
+def test_bearer_header_wins_over_cookie():
+    verifier = make_verifier()
+    request = make_request(
+        {"Authorization": "Bearer header-token", "Cookie": "usso_access_token=c"}
+    )
+    assert verifier.request_token(request) == "header-token"
+
+
+def test_non_bearer_header_falls_back_to_cookie():
+    verifier = make_verifier()
+    request = make_request(
+        {"Authorization": "Basic dXNlcjpwdw==", "Cookie": "usso_access_token=c"}
+    )
+    assert verifier.request_token(request) == "c"
+
+
+def test_no_token():
+    verifier = make_verifier()
+    assert verifier.request_token(make_request({"Authorization": "Basic x"})) is None
+
+
+def test_token_without_kid_uses_single_key():
+    verifier = make_verifier(jwk())
+    assert verify(verifier, make_token()).user_id == "u1"
+
+
+def test_token_without_kid_uses_single_keyed_jwks():
+    verifier = make_verifier(jwk("k1"))
+    assert verify(verifier, make_token()).user_id == "u1"
+
+
+def test_token_without_kid_rejected_with_several_keys():
+    verifier = make_verifier(jwk("k1"), jwk("k2"))
+    with pytest.raises(BaseHTTPException):
+        verify(verifier, make_token())
+
+
+def test_token_with_kid():
+    verifier = make_verifier(jwk("k1"), jwk("k2"))
+    assert verify(verifier, make_token("k2")).user_id == "u1"
+
+
+def test_missing_token_type_is_access():
+    verifier = make_verifier(jwk("k1"))
+    user = verify(verifier, make_token("k1", token_type=None))
+    assert user.token_type == "access"
+
+
+def test_refresh_token_rejected():
+    verifier = make_verifier(jwk("k1"))
+    with pytest.raises(BaseHTTPException) as e:
+        verify(verifier, make_token("k1", token_type="refresh"))
+    assert e.value.error == "invalid_token_type"
+
+
+def test_invalid_payload_is_unauthorized():
+    verifier = make_verifier(jwk("k1"))
+    token = jwt.encode({"sub": "u1"}, SECRET, headers={"kid": "k1"})
+    with pytest.raises(BaseHTTPException) as e:
+        verify(verifier, token)
+    assert e.value.status_code == 401
@@ -0,0 +1,35 @@
+import asyncio
+
+from apps.stocks.jobs import JobTracker
+from singleton import Singleton
+
+
+def make_tracker() -> JobTracker:
+    Singleton._instances.pop(JobTracker, None)
+    return JobTracker()
+
+
+def test_track_keeps_newer_state_of_known_job():
+    tracker = make_tracker()
+    submitted = {"_id": "job1", "status": "pending"}
+    processing = {"_id": "job1", "status": "processing", "progress": 40}
+
+    async def run():
+        tracked = await tracker.track("freepik", submitted)
+        await tracker._update(tracked, processing)
+        queue = asyncio.Queue()
+        tracker.subscribers["job1"] = {queue}
+        tracked = await tracker.track("freepik", submitted)
+        return tracked, queue
+
+    tracked, queue = asyncio.run(run())
+    assert tracked.state == processing
+    assert queue.empty()
+
+
+def test_track_registers_new_job():
+    tracker = make_tracker()
+    job = {"_id": "job2", "status": "pending"}
+    tracked = asyncio.run(tracker.track("freepik", job))
+    assert tracker.jobs["job2"] is tracked
+    assert tracked.state == job
@@ -0,0 +1,35 @@
+import json
+import logging
+import queue
+import sys
+
+from server.log import BoundedQueueHandler, JSONFormatter
+
+
+def failed_record(msg: str, *args) -> logging.LogRecord:
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        return logging.LogRecord(
+            "test", logging.ERROR, __file__, 1, msg, args, sys.exc_info()
+        )
+
+
+def test_prepare_keeps_exc_info_for_the_writer():
+    handler = BoundedQueueHandler(queue.Queue(), max_length=10)
+    record = failed_record("failed %s", "x" * 50)
+
+    prepared = handler.prepare(record)
+    assert prepared.args is None
+    assert prepared.msg.startswith("failed xxx... [")
+    data = json.loads(JSONFormatter().format(prepared))
+    assert data["message"] == prepared.msg
+    assert "ValueError: boom" in data["exception"]
+    assert record.msg == "failed %s"
+
+
+def test_plain_formatter_renders_traceback_once():
+    handler = BoundedQueueHandler(queue.Queue(), max_length=0)
+    prepared = handler.prepare(failed_record("failed"))
+    text = logging.Formatter().format(prepared)
+    assert text.count("ValueError: boom") == 1
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+from utils import aionetwork
+from utils.resilience import CircuitBreaker, CircuitOpenError, HostPolicies
+
+
+def open_breaker(host: str) -> CircuitBreaker:
+    breaker = HostPolicies().breaker(host)
+    breaker.reset_timeout = 0
+    breaker.failures = breaker.threshold
+    breaker.opened_at = 0.0
+    return breaker
+
+
+def test_breaker_single_trial_when_half_open():
+    breaker = CircuitBreaker("example.com", threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == "half_open"
+    assert breaker.check() is True
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.check() is False
+
+
+def test_cancelled_trial_releases_breaker(monkeypatch):
+    breaker = open_breaker("cancelled.example.com")
+
+    async def hang(*args, **kwargs):
+        await asyncio.sleep(3600)
+
+    async def ok(*args, **kwargs):
+        return {"ok": True}
+
+    async def scenario():
+        monkeypatch.setattr(aionetwork, "_aio_request_once", hang)
+        trial = asyncio.ensure_future(
+            aionetwork.aio_request_session(None, url="https://cancelled.example.com/x")
+        )
+        await asyncio.sleep(0)
+        assert breaker.trial_in_flight
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        assert not breaker.trial_in_flight
+
+        monkeypatch.setattr(aionetwork, "_aio_request_once", ok)
+        return await aionetwork.aio_request_session(
+            None, url="https://cancelled.example.com/x"
+        )
+
+    assert asyncio.run(scenario()) == {"ok": True}
+    assert breaker.state == "closed"
+
+
+def test_cancelled_request_keeps_other_trial(monkeypatch):
+    breaker = open_breaker("shared.example.com")
+    breaker.check()
+
+    async def hang(*args, **kwargs):
+        await asyncio.sleep(3600)
+
+    async def scenario():
+        monkeypatch.setattr(aionetwork, "_aio_request_once", hang)
+        breaker.opened_at = None
+        request = asyncio.ensure_future(
+            aionetwork.aio_request_session(None, url="https://shared.example.com/x")
+        )
+        await asyncio.sleep(0)
+        request.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await request
+
+    asyncio.run(scenario())
+    assert breaker.trial_in_flight
+
+
+def test_cancelled_hedged_request_cancels_first_attempt(monkeypatch):
+    started = []
+
+    async def hang(*args, **kwargs):
+        started.append(asyncio.current_task())
+        await asyncio.sleep(3600)
+
+    async def scenario():
+        monkeypatch.setattr(aionetwork, "_aio_request_once", hang)
+        request = asyncio.ensure_future(
+            aionetwork._aio_request_hedged(
+                None, "get", "https://hedged.example.com/x", 3600, None
+            )
+        )
+        await asyncio.sleep(0.01)
+        request.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await request
+        await asyncio.sleep(0)
+        assert len(started) == 1
+        assert started[0].cancelled()
+
+    asyncio.run(scenario())
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+from apps.stocks.cache import SearchCache
+from apps.stocks.manager import BaseStockImageManager, upstream_pages
+from apps.stocks.prefetch import SearchPrefetcher
+from singleton import Singleton
+
+
+class PagedManager(BaseStockImageManager):
+    """Upstream of `total` rows numbered from 1, served `page_size` at a time."""
+
+    page_size = 20
+
+    def __init__(self, total: int = 1000, short: dict | None = None, fail=()):
+        super().__init__()
+        self.total = total
+        self.short = short or {}
+        self.fail = set(fail)
+        self.calls = []
+
+    async def search_upstream_page(self, q: str, page: int, limit: int, **kwargs):
+        self.calls.append((page, limit))
+        if page in self.fail:
+            raise RuntimeError(f"page {page} failed")
+        start = (page - 1) * limit
+        count = self.short.get(page, limit)
+        return [{"id": i} for i in range(start + 1, min(start + count, self.total) + 1)]
+
+
+def make_manager(**kwargs) -> PagedManager:
+    Singleton._instances.pop(PagedManager, None)
+    return PagedManager(**kwargs)
+
+
+def rows(manager: PagedManager, page: int, limit: int) -> list[int]:
+    result = asyncio.run(manager.search_rows(q="cat", page=page, limit=limit))
+    return [row["id"] for row in result]
+
+
+@pytest.mark.parametrize(
+    "page, limit, expected",
+    [
+        (1, 20, (1, 1, 0)),
+        (1, 100, (1, 5, 0)),
+        (2, 30, (2, 3, 10)),
+        (3, 100, (11, 15, 0)),
+        (4, 25, (4, 5, 15)),
+    ],
+)
+def test_upstream_pages(page, limit, expected):
+    assert upstream_pages(page, limit, 20) == expected
+
+
+def test_small_page_is_one_upstream_call():
+    manager = make_manager()
+    assert rows(manager, 3, 10) == list(range(21, 31))
+    assert manager.calls == [(3, 10)]
+
+
+def test_page_2_limit_30():
+    manager = make_manager()
+    assert rows(manager, 2, 30) == list(range(31, 61))
+    assert sorted(manager.calls) == [(2, 20), (3, 20)]
+
+
+def test_page_3_limit_100():
+    manager = make_manager()
+    assert rows(manager, 3, 100) == list(range(201, 301))
+    assert sorted(manager.calls) == [(page, 20) for page in range(11, 16)]
+
+
+def test_stops_at_end_of_results():
+    manager = make_manager(total=45)
+    assert rows(manager, 1, 100) == list(range(1, 46))
+
+
+def test_stops_at_short_middle_page():
+    manager = make_manager(short={3: 5})
+    assert rows(manager, 2, 30) == list(range(31, 46))
+
+
+def test_failed_later_page_keeps_earlier_rows():
+    manager = make_manager(fail={4})
+    assert rows(manager, 1, 100) == list(range(1, 61))
+
+
+def test_failed_first_page_raises():
+    manager = make_manager(fail={2})
+    with pytest.raises(RuntimeError):
+        rows(manager, 2, 30)
+
+
+@pytest.mark.parametrize("method", ["search", "search_json"])
+@pytest.mark.parametrize("total, prefetched", [(25, []), (45, [3])])
+def test_prefetch_only_after_full_page(monkeypatch, method, total, prefetched):
+    Singleton._instances.pop(SearchCache, None)
+    manager = make_manager(total=total)
+    scheduled = []
+
+    async def search(q, page, limit, **kwargs):
+        return await manager.search_rows(q=q, page=page, limit=limit)
+
+    monkeypatch.setattr(manager, "_search", search)
+    monkeypatch.setattr(
+        SearchPrefetcher(),
+        "schedule",
+        lambda manager, q, page, limit, **kwargs: scheduled.append(page),
+    )
+    asyncio.run(getattr(manager, method)(q="cat", page=2, limit=20))
+    assert scheduled == prefetched
@@ -0,0 +1,66 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from apps.stocks import taskqueue
+from apps.stocks.taskqueue import COMPLETED, FAILED, QUEUED, DownloadQueue
+from server import db
+from server.config import Settings
+from singleton import Singleton
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    client = mongomock_motor.AsyncMongoMockClient()
+    monkeypatch.setattr(db, "get_db", lambda: client["stocks"])
+    Singleton._instances.pop(DownloadQueue, None)
+    return DownloadQueue()
+
+
+def finish(queue: DownloadQueue, status: str, age: float):
+    async def run():
+        doc = await queue.enqueue("freepik", 1)
+        await queue.collection.update_one(
+            {"_id": doc["_id"]},
+            {
+                "$set": {
+                    "status": status,
+                    "job_id": "job1",
+                    "job": {"_id": "job1", "status": status},
+                    "updated_at": taskqueue.now() - timedelta(seconds=age),
+                }
+            },
+        )
+        return await queue.enqueue("freepik", 1)
+
+    return asyncio.run(run())
+
+
+def test_enqueue_once(queue):
+    async def run():
+        first = await queue.enqueue("freepik", 1)
+        second = await queue.enqueue("freepik", 1)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first["_id"] == second["_id"] == "freepik:1"
+    assert second["status"] == QUEUED
+
+
+def test_fresh_completed_download_is_reused(queue):
+    doc = finish(queue, COMPLETED, age=60)
+    assert doc["status"] == COMPLETED
+    assert doc["job_id"] == "job1"
+
+
+def test_expired_completed_download_is_queued_again(queue):
+    doc = finish(queue, COMPLETED, age=Settings.download_cache_ttl + 60)
+    assert doc["status"] == QUEUED
+    assert doc["job_id"] is None and doc["job"] is None
+
+
+def test_failed_download_is_queued_again(queue):
+    doc = finish(queue, FAILED, age=0)
+    assert doc["status"] == QUEUED
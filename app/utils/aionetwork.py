@@ -1,13 +1,64 @@
+import asyncio
 import logging
+import time
 from io import BytesIO
+from urllib.parse import urlparse
 
 import aiofiles
 import aiohttp
+from server import metrics
+from server.config import Settings
+from singleton import Singleton
+from utils.resilience import (
+    IDEMPOTENT_METHODS,
+    HostPolicies,
+    backoff_delay,
+    is_upstream_failure,
+)
+
+
+class SessionPool(metaclass=Singleton):
+    """Long-lived `aiohttp.ClientSession` registry, one session per upstream host."""
+
+    def __init__(self):
+        self.sessions: dict[str, aiohttp.ClientSession] = {}
+
+    def _create_session(self, host: str) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=Settings.http_pool_limit,
+            limit_per_host=Settings.http_pool_limit_per_host,
+            keepalive_timeout=Settings.http_keepalive_timeout,
+            use_dns_cache=True,
+            ttl_dns_cache=Settings.http_dns_cache_ttl,
+        )
+        return aiohttp.ClientSession(
+            connector=connector, timeout=HostPolicies().timeout(host)
+        )
+
+    def get_session(self, url: str) -> aiohttp.ClientSession:
+        if url is None:
+            raise ValueError("url is required")
+        if not url.startswith("http"):
+            url = f"https://{url}"
+
+        host = urlparse(url).netloc
+        session = self.sessions.get(host)
+        if session is None or session.closed:
+            session = self._create_session(host)
+            self.sessions[host] = session
+        return session
+
+    async def close(self):
+        sessions = list(self.sessions.values())
+        self.sessions.clear()
+        for session in sessions:
+            if not session.closed:
+                await session.close()
 
 
 async def aio_request(*, method: str = "get", url: str = None, **kwargs) -> dict:
-    async with aiohttp.ClientSession() as session:
-        return await aio_request_session(session, method=method, url=url, **kwargs)
+    session = SessionPool().get_session(url)
+    return await aio_request_session(session, method=method, url=url, **kwargs)
 
 
 async def aio_request_session(
@@ -17,11 +68,120 @@ async def aio_request_session(
     url: str = None,
     **kwargs,
 ) -> dict:
+    """Send a JSON request with per-host circuit breaking and retries.
+
+    Idempotent requests are retried on timeouts, connection errors and 5xx
+    responses with jittered backoff, within the host's retry budget.
+    `hedge_after` sends a second copy of a slow idempotent request after
+    that many seconds and returns whichever answers first.
+    """
     if url is None:
         raise ValueError("url is required")
     if not url.startswith("http"):
         url = f"https://{url}"
 
+    idempotent = method.lower() in IDEMPOTENT_METHODS
+    retries = kwargs.pop("retries", Settings.http_retries if idempotent else 0)
+    hedge_after = kwargs.pop("hedge_after", None)
+    if not idempotent:
+        hedge_after = None
+
+    host = urlparse(url).netloc
+    breaker = HostPolicies().breaker(host)
+    budget = HostPolicies().budget(host)
+    budget.deposit()
+
+    attempt = 0
+    while True:
+        trial = breaker.check()
+        try:
+            if hedge_after:
+                res = await _aio_request_hedged(
+                    session, method, url, hedge_after, budget, **kwargs
+                )
+            else:
+                res = await _aio_request_once(session, method, url, **kwargs)
+        except Exception as e:
+            if not is_upstream_failure(e):
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            if attempt >= retries or not budget.withdraw():
+                raise
+            attempt += 1
+            logging.warning(f"retry {attempt}/{retries} {method} {url}: {e}")
+            await asyncio.sleep(backoff_delay(attempt))
+            continue
+        except BaseException:
+            # cancelled (hedge loser, client disconnect, timeout): no outcome
+            if trial:
+                breaker.release_trial()
+            raise
+
+        breaker.record_success()
+        return res
+
+
+async def _aio_request_hedged(
+    session: aiohttp.ClientSession,
+    method: str,
+    url: str,
+    hedge_after: float,
+    budget,
+    **kwargs,
+) -> dict:
+    first = asyncio.ensure_future(_aio_request_once(session, method, url, **kwargs))
+    tasks = {first}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+        if done or not budget.withdraw():
+            return await first
+
+        tasks.add(
+            asyncio.ensure_future(_aio_request_once(session, method, url, **kwargs))
+        )
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        # also covers the caller being cancelled while waiting on `first`
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def _aio_request_once(
+    session: aiohttp.ClientSession, method: str, url: str, **kwargs
+) -> dict:
+    host = urlparse(url).netloc
+    status = "error"
+    started = time.perf_counter()
+    metrics.UPSTREAM_IN_FLIGHT.labels(host).inc()
+    try:
+        res, status = await _aio_request_json(session, method, url, **kwargs)
+        return res
+    except aiohttp.ClientResponseError as e:
+        status = e.status
+        raise
+    finally:
+        metrics.UPSTREAM_IN_FLIGHT.labels(host).dec()
+        metrics.UPSTREAM_LATENCY.labels(host, method.upper()).observe(
+            time.perf_counter() - started
+        )
+        metrics.UPSTREAM_RESPONSES.labels(host, method.upper(), str(status)).inc()
+
+
+async def _aio_request_json(
+    session: aiohttp.ClientSession, method: str, url: str, **kwargs
+) -> tuple[dict, int]:
     raise_exception = kwargs.pop("raise_exception", True)
 
     async with session.request(method, url, **kwargs) as response:
@@ -32,16 +192,14 @@ async def aio_request_session(
             )
         if raise_exception:
             response.raise_for_status()
-        return await response.json()
+        return await response.json(), response.status
 
 
 async def aio_request_binary(
     *, method: str = "get", url: str = None, **kwargs
 ) -> BytesIO:
-    async with aiohttp.ClientSession() as session:
-        return await aio_request_binary_session(
-            session, method=method, url=url, **kwargs
-        )
+    session = SessionPool().get_session(url)
+    return await aio_request_binary_session(session, method=method, url=url, **kwargs)
 
 
 async def aio_request_binary_session(
@@ -67,8 +225,8 @@ async def aio_request_binary_session(
 
 
 async def aio_download(url: str, filename: str, **kwargs):
-    async with aiohttp.ClientSession() as session:
-        return await aio_download_session(session, url, filename, **kwargs)
+    session = SessionPool().get_session(url)
+    return await aio_download_session(session, url, filename, **kwargs)
 
 
 async def aio_download_session(
@@ -87,7 +245,7 @@ async def aio_download_session(
 
         async with aiofiles.open(filename, "wb") as f:
             while True:
-                chunk = await response.content.read(1024)
+                chunk = await response.content.read(Settings.download_chunk_size)
                 if not chunk:
                     break
                 await f.write(chunk)
@@ -0,0 +1,74 @@
+import hashlib
+import logging
+import os
+import uuid
+from pathlib import Path
+
+
+class DiskCache:
+    """Size-bounded on-disk file cache with least-recently-used eviction.
+
+    Files are written to a temporary name and renamed into place once they
+    are complete, so readers never see a partial file.
+    """
+
+    def __init__(self, directory: Path, max_size: int):
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path(self, key: str) -> Path:
+        return self.directory / hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, key: str) -> Path | None:
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def temp_path(self, key: str) -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        return self.directory / f".{self.path(key).name}.{uuid.uuid4().hex}.tmp"
+
+    def commit(self, key: str, temp_path: Path):
+        os.replace(temp_path, self.path(key))
+        self.evict()
+
+    def discard(self, temp_path: Path):
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.startswith("."):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError as e:
+                logging.warning(f"disk cache evict {path}: {e}")
+                continue
+            total -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "max_size": self.max_size,
+        }
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import math
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from server.config import Settings
+from singleton import Singleton
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Parse a Retry-After header given either as seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class RateLimiter:
+    """Token bucket with a max-in-flight semaphore and adaptive 429 backoff.
+
+    Every throttled response halves the effective rate and blocks new
+    requests until the upstream's Retry-After has passed; successful
+    responses slowly restore the configured rate.
+    """
+
+    def __init__(
+        self,
+        rate: float = 10,
+        burst: int = 20,
+        max_in_flight: int = 10,
+        min_factor: float = 0.1,
+        recovery: float = 0.05,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.min_factor = min_factor
+        self.recovery = recovery
+
+        self.factor = 1.0
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.in_flight = 0
+        self.throttled = 0
+        self.consecutive_throttles = 0
+
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._lock = asyncio.Lock()
+
+    @property
+    def effective_rate(self) -> float:
+        return self.rate * self.factor
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        self.updated = now
+        self.tokens = min(self.burst, self.tokens + elapsed * self.effective_rate)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.effective_rate)
+
+    @asynccontextmanager
+    async def limit(self):
+        async with self._semaphore:
+            await self.acquire()
+            self.in_flight += 1
+            try:
+                yield self
+            finally:
+                self.in_flight -= 1
+
+    def backoff(self, retry_after: float | None = None):
+        self.throttled += 1
+        self.consecutive_throttles += 1
+        self.factor = max(self.min_factor, self.factor / 2)
+        if retry_after is None:
+            retry_after = min(30.0, 0.5 * 2**self.consecutive_throttles)
+        self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+        self.tokens = 0.0
+
+    def success(self):
+        self.consecutive_throttles = 0
+        self.factor = min(1.0, self.factor + self.recovery)
+
+    @property
+    def throttled_recently(self) -> bool:
+        """Whether a 429 still limits the rate or blocks new requests."""
+        return self.factor < 1.0 or time.monotonic() < self.blocked_until
+
+    @property
+    def load(self) -> float:
+        """Share of the in-flight budget currently in use."""
+        return self.in_flight / self.max_in_flight
+
+    def stats(self) -> dict:
+        return {
+            "rate": self.rate,
+            "effective_rate": self.effective_rate,
+            "burst": self.burst,
+            "tokens": self.tokens,
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "throttled": self.throttled,
+            "blocked_for": max(0.0, self.blocked_until - time.monotonic()),
+        }
+
+
+class RateLimiterRegistry(metaclass=Singleton):
+    """Shared `RateLimiter` per upstream provider, configured from settings.
+
+    `RATE_LIMITS` is the budget of the whole deployment; with several
+    workers each process gets an equal share so scaling out does not
+    multiply upstream quota use.
+    """
+
+    def __init__(self):
+        self.limiters: dict[str, RateLimiter] = {}
+        self.config: dict[str, dict] = json.loads(Settings.RATE_LIMITS)
+
+    def get(self, name: str) -> RateLimiter:
+        limiter = self.limiters.get(name)
+        if limiter is None:
+            config = self.config.get(name, self.config.get("default", {}))
+            limiter = RateLimiter(**self.partition(config, Settings.workers))
+            self.limiters[name] = limiter
+        return limiter
+
+    @staticmethod
+    def partition(config: dict, workers: int) -> dict:
+        if workers <= 1:
+            return config
+        config = dict(config)
+        if "rate" in config:
+            config["rate"] = config["rate"] / workers
+        for key in ("burst", "max_in_flight"):
+            if key in config:
+                config[key] = max(1, math.ceil(config[key] / workers))
+        return config
+
+    def stats(self) -> dict:
+        return {name: limiter.stats() for name, limiter in self.limiters.items()}
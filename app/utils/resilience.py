@@ -0,0 +1,157 @@
+import asyncio
+import json
+import random
+import time
+
+import aiohttp
+from server.config import Settings
+from singleton import Singleton
+
+RETRYABLE_STATUSES = {500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"get", "head", "options"}
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, host: str, retry_in: float):
+        self.host = host
+        self.retry_in = retry_in
+        super().__init__(f"Circuit open for {host}, retry in {retry_in:.1f}s")
+
+
+def is_upstream_failure(e: BaseException) -> bool:
+    """Whether an error means the upstream itself is unhealthy."""
+    if isinstance(e, aiohttp.ClientResponseError):
+        return e.status in RETRYABLE_STATUSES
+    return isinstance(e, (asyncio.TimeoutError, aiohttp.ClientConnectionError))
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff."""
+    cap = min(Settings.http_retry_max_backoff, Settings.http_retry_backoff * 2**attempt)
+    return random.uniform(0, cap)
+
+
+class CircuitBreaker:
+    """Fail fast while a host keeps failing.
+
+    After `threshold` consecutive failures the circuit opens for
+    `reset_timeout` seconds; then a single trial request is let through and
+    its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, host: str, threshold: int = 5, reset_timeout: float = 30):
+        self.host = host
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.trial_in_flight = False
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def check(self) -> bool:
+        """Raise while open; return whether the caller holds the trial slot."""
+        state = self.state
+        if state == "closed":
+            return False
+        if state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        retry_in = max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+        raise CircuitOpenError(self.host, retry_in)
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def release_trial(self):
+        """Give the trial slot back when the trial ended without an outcome."""
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.trial_in_flight or self.failures >= self.threshold:
+            if self.opened_at is None or self.trial_in_flight:
+                self.opened += 1
+            self.opened_at = time.monotonic()
+        self.trial_in_flight = False
+
+    def stats(self) -> dict:
+        return {"state": self.state, "failures": self.failures, "opened": self.opened}
+
+
+class RetryBudget:
+    """Cap retries and hedges to a fraction of the regular request volume."""
+
+    def __init__(self, ratio: float = 0.2, min_tokens: float = 10):
+        self.ratio = ratio
+        self.max_tokens = min_tokens
+        self.tokens = min_tokens
+        self.retries = 0
+        self.exhausted = 0
+
+    def deposit(self):
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1:
+            self.exhausted += 1
+            return False
+        self.tokens -= 1
+        self.retries += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "tokens": self.tokens,
+            "retries": self.retries,
+            "exhausted": self.exhausted,
+        }
+
+
+class HostPolicies(metaclass=Singleton):
+    """Per-host timeouts, circuit breakers and retry budgets."""
+
+    def __init__(self):
+        self.timeouts: dict[str, dict] = json.loads(Settings.HTTP_TIMEOUTS)
+        self.breakers: dict[str, CircuitBreaker] = {}
+        self.budgets: dict[str, RetryBudget] = {}
+
+    def timeout(self, host: str) -> aiohttp.ClientTimeout:
+        config = self.timeouts.get(host, self.timeouts.get("default", {}))
+        return aiohttp.ClientTimeout(**config)
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        breaker = self.breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                host,
+                threshold=Settings.http_breaker_threshold,
+                reset_timeout=Settings.http_breaker_reset,
+            )
+            self.breakers[host] = breaker
+        return breaker
+
+    def budget(self, host: str) -> RetryBudget:
+        budget = self.budgets.get(host)
+        if budget is None:
+            budget = RetryBudget(ratio=Settings.http_retry_budget_ratio)
+            self.budgets[host] = budget
+        return budget
+
+    def stats(self) -> dict:
+        return {
+            host: {
+                "breaker": self.breaker(host).stats(),
+                "retry_budget": self.budget(host).stats(),
+            }
+            for host in self.breakers.keys() | self.budgets.keys()
+        }
@@ -0,0 +1,129 @@
+import asyncio
+import fcntl
+import json
+import os
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from server import db
+
+
+class SharedFileStore:
+    """Small JSON document shared by the worker processes of one host.
+
+    Writes are atomic renames, so readers never see a partial document;
+    `lock()` takes an exclusive `flock` on a sidecar file so one worker at a
+    time can do read-modify-write work such as a token refresh.
+    """
+
+    def __init__(self, path: Path, poll: float = 0.05):
+        self.path = Path(path)
+        self.poll = poll
+        self.lock_path = self.path.with_suffix(".lock")
+
+    def read(self) -> dict:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def write(self, data: dict):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            # a leftover temp file would keep its mode through O_TRUNC
+            os.unlink(temp)
+        except FileNotFoundError:
+            pass
+        fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(temp, self.path)
+
+    @asynccontextmanager
+    async def lock(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    await asyncio.sleep(self.poll)
+            try:
+                yield self
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    async def load(self) -> dict:
+        return self.read()
+
+    async def save(self, data: dict):
+        self.write(data)
+
+
+class MongoSharedStore:
+    """Small JSON document shared by processes on any host through Mongo.
+
+    `lock()` takes a lease on the document instead of a `flock`, so it also
+    serializes workers running on different nodes; a holder that dies loses
+    the lock once its lease runs out.
+    """
+
+    collection_name = "shared_state"
+
+    def __init__(self, key: str, lease: float = 60, poll: float = 0.2):
+        self.key = key
+        self.lease = lease
+        self.poll = poll
+
+    @property
+    def collection(self):
+        return db.get_db()[self.collection_name]
+
+    async def load(self) -> dict:
+        doc = await self.collection.find_one({"_id": self.key}, {"data": 1})
+        return (doc or {}).get("data") or {}
+
+    async def save(self, data: dict):
+        await self.collection.update_one(
+            {"_id": self.key},
+            {"$set": {"data": data, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+
+    @asynccontextmanager
+    async def lock(self):
+        await self.collection.update_one(
+            {"_id": self.key},
+            {"$setOnInsert": {"lock_until": datetime.fromtimestamp(0, timezone.utc)}},
+            upsert=True,
+        )
+        lock_id = uuid.uuid4().hex
+        while True:
+            now = datetime.now(timezone.utc)
+            doc = await self.collection.find_one_and_update(
+                {"_id": self.key, "lock_until": {"$lte": now}},
+                {
+                    "$set": {
+                        "lock_until": now + timedelta(seconds=self.lease),
+                        "lock_id": lock_id,
+                    }
+                },
+            )
+            if doc is not None:
+                break
+            await asyncio.sleep(self.poll)
+        try:
+            yield self
+        finally:
+            await self.collection.update_one(
+                {"_id": self.key, "lock_id": lock_id},
+                {"$set": {"lock_until": datetime.now(timezone.utc), "lock_id": None}},
+            )
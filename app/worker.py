@@ -0,0 +1,32 @@
+import asyncio
+import signal
+
+from apps.stocks.decodl import DecodlCredentials
+from apps.stocks.taskqueue import DownloadWorker
+from server import db, log
+from utils.aionetwork import SessionPool
+
+
+async def main():
+    """Run a download worker until SIGINT or SIGTERM."""
+    log.setup()
+    await db.init_db()
+    decodl_credentials = DecodlCredentials()
+    decodl_credentials.start()
+
+    worker = DownloadWorker()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+
+    try:
+        await worker.run()
+    finally:
+        await decodl_credentials.stop()
+        await SessionPool().close()
+        await db.close_db()
+        log.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())